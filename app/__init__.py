@@ -1,17 +1,41 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from flask_talisman import Talisman
 from flask_limiter import RateLimitExceeded
+from flask_talisman import Talisman
 
-from app.common.db import db, migrate
-from app.common.limiter import limiter
+from app.common.db import db, migrate, configure_sqlite
+from app.common.limiter import configure_rate_limits
+from app.common.jobs import job_queue
+from app.common.prefetch import prefetcher
+from app.common.preferences import category_sampler
+from app.common.http_cache import http_cache
+from app.common.writer import write_queue
+from app.common.search import task_search
+from app.common.catalogue import task_catalogue
+from app.common.generation_cache import generation_cache
+from app.common.budget import generation_budget
+from app.common.pool import pool_monitor
+from app.common.log import request_logger
+from app.common.errors import release_session
 from app.common.middleware import handle_unexpected_error
+from app.common.compact import strip_browser_headers
+from app.common.profiler import endpoint_profiler
 from app.common.exceptions import CustomAPIException
 from app.common.swagger import configure_swagger
 from .config import config
 from app.routes.category import category_bp
 from app.routes.task import task_bp
 from app.routes.user import user_bp
+from app.routes.job import job_bp
+from app.routes.health import health_bp
+from app.routes.debug import debug_bp
+from app.commands.user_task import user_task_cli
+from app.commands.preference import preference_cli
+from app.commands.swagger import swagger_cli
+from app.commands.search import search_cli
+from app.commands.generation_cache import generation_cache_cli
+from app.commands.catalogue import catalogue_cli
+from app.commands.category import category_cli
 
 def create_app(config_mode):
     app = Flask(__name__)
@@ -25,22 +49,51 @@ def create_app(config_mode):
         "style-src": ["'self'", "'unsafe-inline'", "https://cdnjs.cloudflare.com"],
         "img-src": ["'self'", "data:"],
     }
+    app.after_request(strip_browser_headers)
     Talisman(app, content_security_policy=csp)
 
 
-    limiter.init_app(app)
+    configure_rate_limits(app)
 
     db.init_app(app)
     migrate.init_app(app, db)
+    configure_sqlite(app)
+    pool_monitor.init_app(app)
+    request_logger.init_app(app)
+
+    job_queue.init_app(app)
+    prefetcher.init_app(app)
+    category_sampler.init_app(app)
+    http_cache.init_app(app)
+    write_queue.init_app(app)
+    task_search.init_app(app)
+    task_catalogue.init_app(app)
+    generation_cache.init_app(app)
+    generation_budget.init_app(app)
 
     configure_swagger(app)
 
     app.register_blueprint(category_bp, url_prefix="/categories")
     app.register_blueprint(task_bp, url_prefix="/tasks")
     app.register_blueprint(user_bp, url_prefix="/users")
+    app.register_blueprint(job_bp, url_prefix="/jobs")
+    app.register_blueprint(health_bp, url_prefix="/health")
+    app.register_blueprint(debug_bp, url_prefix="/debug")
+
+    # Wraps view functions, so after the blueprints
+    endpoint_profiler.init_app(app)
+
+    app.cli.add_command(user_task_cli)
+    app.cli.add_command(preference_cli)
+    app.cli.add_command(swagger_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(generation_cache_cli)
+    app.cli.add_command(catalogue_cli)
+    app.cli.add_command(category_cli)
 
     @app.errorhandler(CustomAPIException)
     def handle_custom_api_exception(e):
+        release_session(e)
         return jsonify(e.to_dict()), e.status_code
 
     @app.errorhandler(RateLimitExceeded)
@@ -0,0 +1,23 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.common.catalogue import read_header, task_catalogue
+
+catalogue_cli = AppGroup("catalogue", help="Task catalogue commands.")
+
+@catalogue_cli.command("rebuild")
+def rebuild_catalogue():
+    """
+    Write the shared catalogue file from the tasks table, e.g. after a bulk
+    import. Workers map the new version at their next poll.
+    """
+    path = current_app.config["TASK_CATALOGUE_PATH"]
+    if not path:
+        raise click.ClickException("TASK_CATALOGUE_PATH is not set, each worker loads its own catalogue")
+
+    task_catalogue.rebuild(force=True)
+    header = read_header(path)
+    click.echo(f"Wrote {header['tasks']} tasks to {path} ({os.path.getsize(path)} bytes), version {header['version']}")
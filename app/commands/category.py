@@ -0,0 +1,29 @@
+import click
+from flask.cli import AppGroup
+
+from app.models.category import Category
+from app.controllers.category import purge_category
+
+category_cli = AppGroup("categories", help="Maintenance commands for categories.")
+
+@category_cli.command("purge")
+def purge_categories():
+    """
+    Purge every deleted category that is still in the database, e.g. when
+    its `categories.purge` job was lost with the worker that held it.
+    """
+    category_ids = [
+        category_id for category_id, in
+        Category.query.execution_options(include_deleted=True)
+        .with_entities(Category.id)
+        .filter(Category.deleted_at.isnot(None))
+        .all()
+    ]
+    for category_id in category_ids:
+        deleted = purge_category(category_id)
+        click.echo(
+            f"Purged category {category_id}: {deleted['tasks']} tasks, "
+            f"{deleted['user_tasks'] + deleted['user_tasks_archive']} assignments, "
+            f"{deleted['user_category_preferences']} preferences"
+        )
+    click.echo(f"Purged {len(category_ids)} categories")
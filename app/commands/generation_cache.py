@@ -0,0 +1,31 @@
+import click
+from flask.cli import AppGroup
+
+from app.common.generation_cache import generation_cache
+
+generation_cache_cli = AppGroup("generation-cache", help="Cache of OpenAI task generations.")
+
+@generation_cache_cli.command("stats")
+def show_stats():
+    """
+    Print the number of cached generations and the hit/miss counters.
+    """
+    if not generation_cache.enabled:
+        click.echo("Generation cache is disabled")
+        return
+
+    stats = generation_cache.stats()
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    hit_rate = hits / (hits + misses) if hits + misses else 0
+    click.echo(f"entries: {stats['entries']}")
+    click.echo(f"hits:    {hits}")
+    click.echo(f"misses:  {misses}")
+    click.echo(f"hit rate: {hit_rate:.1%}")
+
+@generation_cache_cli.command("clear")
+def clear_cache():
+    """
+    Drop every cached generation and reset the counters.
+    """
+    generation_cache.clear()
+    click.echo("Generation cache cleared")
@@ -0,0 +1,44 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, union_all
+
+from app.models.task import Task
+from app.models.user import User
+from app.models.user_task import UserTask
+from app.models.user_task_archive import UserTaskArchive
+from app.models.user_category_preference import UserCategoryPreference
+from app.common.db import db
+
+preference_cli = AppGroup("preferences", help="Maintenance commands for user category preferences.")
+
+@preference_cli.command("rebuild")
+def rebuild_preferences():
+    """
+    Recompute every user's category weights from their completed tasks, archived ones included.
+    """
+    completed = union_all(
+        select(UserTask.user_id, UserTask.task_id).where(UserTask.status == "completed"),
+        select(UserTaskArchive.user_id, UserTaskArchive.task_id),
+    ).subquery()
+    weights = (
+        db.session.query(completed.c.user_id, Task.category_id, func.count())
+        .join(Task, Task.id == completed.c.task_id)
+        .group_by(completed.c.user_id, Task.category_id)
+        .all()
+    )
+
+    UserCategoryPreference.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(
+        UserCategoryPreference,
+        [
+            {"user_id": user_id, "category_id": category_id, "weight": count}
+            for user_id, category_id, count in weights
+        ],
+    )
+    User.query.execution_options(http_cache=False).update(
+        {"category_weights_version": User.category_weights_version + 1},
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+    click.echo(f"Rebuilt {len(weights)} category weights")
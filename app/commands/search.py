@@ -0,0 +1,16 @@
+import click
+from flask.cli import AppGroup
+
+from app.common.db import db
+from app.common.search import task_search
+
+search_cli = AppGroup("search", help="Task search index commands.")
+
+@search_cli.command("rebuild")
+def rebuild_search():
+    """
+    Create the search index if missing and rebuild it from the tasks table.
+    """
+    task_search.rebuild()
+    db.session.commit()
+    click.echo(f"Rebuilt the {task_search.backend.name} search index")
@@ -0,0 +1,18 @@
+import json
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+swagger_cli = AppGroup("swagger", help="Swagger documentation commands.")
+
+@swagger_cli.command("export")
+@click.argument("path", default="swagger.json")
+def export_swagger(path):
+    """
+    Write the OpenAPI spec built from the route docstrings to PATH.
+    """
+    spec = current_app.swag.get_apispecs("swagger")
+    with open(path, "w") as f:
+        json.dump(spec, f, indent=2, default=str)
+    click.echo(f"Swagger spec written to {path}")
@@ -0,0 +1,72 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from app.models.user_task import UserTask
+from app.controllers.user import archive_user_tasks
+from app.common.db import db
+
+user_task_cli = AppGroup("user-tasks", help="Maintenance commands for user tasks.")
+
+@user_task_cli.command("compact")
+@click.option("--batch-size", default=1000, show_default=True, help="Duplicate groups merged per transaction.")
+def compact_user_tasks(batch_size):
+    """
+    Merge duplicate (user_id, task_id) rows into a single row.
+
+    The oldest row of each group is kept. It becomes "completed" if any
+    duplicate was completed, with the latest completion time. Every batch
+    is committed separately so the table is never locked for long.
+    """
+    merged = 0
+    while True:
+        groups = (
+            db.session.query(
+                UserTask.user_id,
+                UserTask.task_id,
+                func.min(UserTask.id),
+                func.max(UserTask.completed_at),
+            )
+            .group_by(UserTask.user_id, UserTask.task_id)
+            .having(func.count(UserTask.id) > 1)
+            .limit(batch_size)
+            .all()
+        )
+        if not groups:
+            break
+
+        for user_id, task_id, keep_id, completed_at in groups:
+            UserTask.query.filter(
+                UserTask.user_id == user_id,
+                UserTask.task_id == task_id,
+                UserTask.id != keep_id,
+            ).delete(synchronize_session=False)
+
+            if completed_at:
+                UserTask.query.filter_by(id=keep_id).update(
+                    {"status": "completed", "completed_at": completed_at},
+                    synchronize_session=False,
+                )
+
+        db.session.commit()
+        merged += len(groups)
+        click.echo(f"Merged {merged} duplicate groups")
+
+    click.echo(f"Done, {merged} duplicate groups merged")
+
+@user_task_cli.command("archive")
+@click.option("--older-than-days", type=int, default=None, help="Defaults to USER_TASKS_ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows moved per transaction.")
+def archive_completed_user_tasks(older_than_days, batch_size):
+    """
+    Move completed user tasks older than N days to user_tasks_archive.
+
+    Meant to run periodically (cron, or enqueue the "user_tasks.archive" job).
+    Archived rows are only returned by GET /users/<telegram_id>/tasks?archive=true.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config["USER_TASKS_ARCHIVE_AFTER_DAYS"]
+
+    archived = archive_user_tasks(older_than_days, batch_size)
+    click.echo(f"Done, {archived} user tasks archived")
@@ -0,0 +1,22 @@
+import hmac
+from functools import wraps
+
+from flask import current_app, request
+
+from app.common.exceptions import ForbiddenError, NotFoundError
+
+def admin_only(view):
+    """
+    Require ADMIN_API_KEY in the `X-Admin-Key` header. Without a configured
+    key the route does not exist.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admin_key = current_app.config["ADMIN_API_KEY"]
+        if not admin_key:
+            raise NotFoundError("Route not found")
+        key = request.headers.get("X-Admin-Key", "")
+        if not hmac.compare_digest(key.encode(), admin_key.encode()):
+            raise ForbiddenError("Invalid admin key")
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,41 @@
+import random
+
+class AliasTable:
+    """
+    Walker/Vose alias table: O(n) to build, O(1) per weighted sample.
+    """
+    def __init__(self, items, weights):
+        if not items:
+            raise ValueError("Alias table needs at least one item.")
+
+        n = len(items)
+        total = float(sum(weights))
+        if total > 0:
+            scaled = [weight * n / total for weight in weights]
+        else:
+            # All weights are 0 (e.g. CATEGORY_BASE_WEIGHT=0 and no preferences yet), sample uniformly
+            scaled = [1.0] * n
+
+        self.items = list(items)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Whatever is left is 1.0 up to rounding errors
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.items))
+        if rng.random() < self.prob[i]:
+            return self.items[i]
+        return self.items[self.alias[i]]
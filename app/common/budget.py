@@ -0,0 +1,166 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.common.exceptions import GenerationBudgetExceededError
+
+# Refills the bucket, drops expired leases, then takes `cost` tokens and a lease if both are available
+ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local max_inflight = tonumber(ARGV[4])
+local now = tonumber(ARGV[5])
+local lease = ARGV[6]
+local lease_ttl = tonumber(ARGV[7])
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", now)
+local acquired = 0
+if tokens >= cost and redis.call("ZCARD", KEYS[2]) < max_inflight then
+    tokens = tokens - cost
+    redis.call("ZADD", KEYS[2], now + lease_ttl, lease)
+    acquired = 1
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+return acquired
+"""
+
+# Gives back the reserved tokens the call did not use (or takes the overrun) and ends the lease
+RELEASE_SCRIPT = """
+redis.call("HINCRBYFLOAT", KEYS[1], "tokens", ARGV[1])
+redis.call("ZREM", KEYS[2], ARGV[2])
+"""
+
+class MemoryBudget:
+    """
+    Per-process bucket, only a global budget with a single worker.
+    """
+    def __init__(self, capacity, rate, max_inflight):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_inflight = max_inflight
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost, lease, lease_ttl):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= cost and self._inflight < self.max_inflight:
+                self._tokens -= cost
+                self._inflight += 1
+                return True
+            return False
+
+    def release(self, refund, lease):
+        with self._lock:
+            self._tokens += refund
+            self._inflight -= 1
+
+
+class RedisBudget:
+    """
+    Bucket and in-flight leases shared by every worker. Leases expire, so a
+    worker dying mid-call does not hold a concurrency slot forever.
+    """
+    BUCKET_KEY = "generation_budget:tokens"
+    INFLIGHT_KEY = "generation_budget:inflight"
+
+    def __init__(self, uri, capacity, rate, max_inflight):
+        import redis
+
+        self.client = redis.Redis.from_url(uri, decode_responses=True)
+        self.capacity = capacity
+        self.rate = rate
+        self.max_inflight = max_inflight
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._release = self.client.register_script(RELEASE_SCRIPT)
+
+    def acquire(self, cost, lease, lease_ttl):
+        acquired = self._acquire(
+            keys=[self.BUCKET_KEY, self.INFLIGHT_KEY],
+            args=[self.capacity, self.rate, cost, self.max_inflight, time.time(), lease, lease_ttl],
+        )
+        return bool(acquired)
+
+    def release(self, refund, lease):
+        self._release(keys=[self.BUCKET_KEY, self.INFLIGHT_KEY], args=[refund, lease])
+
+
+class GenerationBudget:
+    """
+    Global ceiling on OpenAI usage: a token bucket refilled at
+    GENERATION_TOKENS_PER_MINUTE plus at most GENERATION_MAX_CONCURRENCY
+    calls in flight.
+
+    A call reserves GENERATION_ESTIMATED_TOKENS up front, the difference to
+    the `usage` reported by OpenAI is settled when it returns. A call that
+    finds no room waits up to GENERATION_BUDGET_WAIT seconds for it.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.store = None
+
+    def init_app(self, app):
+        self.enabled = app.config["GENERATION_BUDGET_ENABLED"]
+        self.estimated_tokens = app.config["GENERATION_ESTIMATED_TOKENS"]
+        self.wait = app.config["GENERATION_BUDGET_WAIT"]
+        self.lease_ttl = app.config["GENERATION_LEASE_TTL"]
+        if not self.enabled:
+            return
+
+        capacity = app.config["GENERATION_TOKENS_PER_MINUTE"]
+        rate = capacity / 60
+        max_inflight = app.config["GENERATION_MAX_CONCURRENCY"]
+        if app.config["GENERATION_BUDGET_REDIS_URI"]:
+            self.store = RedisBudget(app.config["GENERATION_BUDGET_REDIS_URI"], capacity, rate, max_inflight)
+        else:
+            self.store = MemoryBudget(capacity, rate, max_inflight)
+
+    @contextmanager
+    def reserve(self):
+        """
+        Hold a slot of the budget around one OpenAI call, the body reports
+        the tokens it used with `lease.used(chat_completion.usage)`.
+        """
+        if not self.enabled:
+            yield Lease()
+            return
+
+        lease = Lease(uuid.uuid4().hex, self.estimated_tokens)
+        deadline = time.monotonic() + self.wait
+        delay = 0.05
+        while not self.store.acquire(lease.reserved, lease.id, self.lease_ttl):
+            if time.monotonic() + delay > deadline:
+                raise GenerationBudgetExceededError("Generation budget exceeded, try again later.")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            yield lease
+        finally:
+            self.store.release(lease.reserved - lease.tokens, lease.id)
+
+
+class Lease:
+    def __init__(self, id=None, reserved=0):
+        self.id = id
+        self.reserved = reserved
+        # Until usage is reported the whole reservation counts as spent
+        self.tokens = reserved
+
+    def used(self, usage):
+        if usage is not None:
+            self.tokens = usage.total_tokens
+
+generation_budget = GenerationBudget()
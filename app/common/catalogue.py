@@ -0,0 +1,454 @@
+import bisect
+import json
+import mmap
+import os
+import random
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.models.task import Task
+from app.models.category import Category
+from app.common.db import db
+
+# Catalogue file: MAGIC, header length (8 bytes), JSON header, then the columns aligned to 8 bytes
+MAGIC = b"TASKCAT1"
+
+class CatalogueSnapshot:
+    """
+    Tasks as columns, sorted by id. `codes[i]` is the index of the task's
+    category in `category_ids`, and its UTF-8 description is
+    `blob[offsets[i]:offsets[i + 1]]`. About 14 bytes per task on top of the
+    descriptions, against several hundred for a dict per task.
+
+    Columns are arrays, or memoryviews of a mapped catalogue file.
+    """
+    def __init__(self, ids, codes, category_ids, offsets, blob, positions):
+        self.ids = ids
+        self.codes = codes
+        self.category_ids = category_ids
+        self.offsets = offsets
+        self.blob = blob
+        # Positions of the tasks of each category, to pick a random one
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, task_id):
+        position = bisect.bisect_left(self.ids, task_id)
+        if position < len(self.ids) and self.ids[position] == task_id:
+            return position
+        return None
+
+    def row(self, position):
+        description = bytes(self.blob[self.offsets[position]:self.offsets[position + 1]]).decode()
+        return self.ids[position], self.category_ids[self.codes[position]], description
+
+    def columns(self):
+        positions = array("i")
+        for category_id in self.category_ids:
+            positions.frombytes(bytes(self.positions[category_id]))
+        return {
+            "ids": self.ids,
+            "codes": self.codes,
+            "offsets": self.offsets,
+            "descriptions": self.blob,
+            "category_positions": positions,
+        }
+
+    def nbytes(self):
+        sizes = {
+            "ids": self.ids,
+            "codes": self.codes,
+            "offsets": self.offsets,
+            "descriptions": self.blob,
+        }
+        sizes = {name: memoryview(column).nbytes for name, column in sizes.items()}
+        sizes["category_positions"] = sum(memoryview(positions).nbytes for positions in self.positions.values())
+        return sizes
+
+def build_snapshot(rows):
+    """
+    Snapshot of (id, category_id, description) rows, given in id order.
+    """
+    ids = array("i")
+    codes = array("i")
+    category_index = {}
+    offsets = array("Q", [0])
+    # Grown in place, a list of encoded descriptions would take several times the blob while loading
+    blob = bytearray()
+    for task_id, category_id, description in rows:
+        ids.append(task_id)
+        codes.append(category_index.setdefault(category_id, len(category_index)))
+        blob += description.encode()
+        offsets.append(len(blob))
+
+    positions = [array("i") for _ in category_index]
+    for position, code in enumerate(codes):
+        positions[code].append(position)
+
+    return CatalogueSnapshot(
+        ids,
+        array("H", codes) if len(category_index) <= 0xFFFF else codes,
+        tuple(category_index),
+        array("I", offsets) if len(blob) <= 0xFFFFFFFF else offsets,
+        blob,
+        dict(zip(category_index, positions)),
+    )
+
+def _padding(size):
+    return -size % 8
+
+def write_snapshot(path, snapshot, version, watermark):
+    """
+    Write the snapshot as a read-only catalogue file, replacing `path` atomically.
+    Processes that mapped the previous file keep reading it until they remap.
+    """
+    columns = snapshot.columns()
+    sections = {}
+    offset = 0
+    for name, column in columns.items():
+        view = memoryview(column)
+        sections[name] = [offset, view.format, view.nbytes]
+        offset += view.nbytes + _padding(view.nbytes)
+
+    category_ranges = []
+    start = 0
+    for category_id in snapshot.category_ids:
+        category_ranges.append([category_id, start, start + len(snapshot.positions[category_id])])
+        start = category_ranges[-1][2]
+
+    header = json.dumps({
+        "version": version,
+        "tasks": len(snapshot),
+        "watermark": watermark.isoformat() if watermark else None,
+        "categories": category_ranges,
+        "sections": sections,
+    }).encode()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header + bytes(_padding(len(header))))
+        for column in columns.values():
+            view = memoryview(column)
+            f.write(view)
+            f.write(bytes(_padding(view.nbytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(temporary, 0o444)
+    os.replace(temporary, path)
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a task catalogue file")
+        length = int.from_bytes(f.read(8), "little")
+        return json.loads(f.read(length))
+
+def map_snapshot(path):
+    """
+    Snapshot over a catalogue file mapped read-only. Its pages are the page
+    cache's, every process that maps the file shares them.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if view[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a task catalogue file")
+    length = int.from_bytes(view[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(bytes(view[len(MAGIC) + 8:len(MAGIC) + 8 + length]))
+    data = len(MAGIC) + 8 + length + _padding(length)
+
+    def section(name):
+        offset, typecode, size = header["sections"][name]
+        return view[data + offset:data + offset + size].cast(typecode)
+
+    positions = section("category_positions")
+    snapshot = CatalogueSnapshot(
+        section("ids"),
+        section("codes"),
+        tuple(category_id for category_id, _, _ in header["categories"]),
+        section("offsets"),
+        section("descriptions"),
+        {category_id: positions[start:end] for category_id, start, end in header["categories"]},
+    )
+    return snapshot, header
+
+def load_snapshot():
+    """
+    Snapshot of the tasks table and the latest `updated_at` in it.
+    """
+    watermark = None
+
+    def rows():
+        nonlocal watermark
+        query = (
+            db.session.query(Task.id, Task.category_id, Task.description, Task.updated_at)
+            .order_by(Task.id)
+            .yield_per(10000)
+        )
+        for task_id, category_id, description, updated_at in query:
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+            yield task_id, category_id, description
+
+    snapshot = build_snapshot(rows())
+    return snapshot, watermark
+
+
+class CatalogueState:
+    """
+    A snapshot with the changes made since it was built. `changes` maps a task
+    id to (category_id, description), None for a deleted task, and `added`
+    lists per category the changed ids the snapshot has elsewhere or not at all.
+    """
+    def __init__(self, snapshot, names, watermark, version=None):
+        self.snapshot = snapshot
+        self.version = version
+        self.names = names
+        self.watermark = watermark
+        self.changes = {}
+        self.added = defaultdict(list)
+        self.size = len(snapshot)
+        self.loaded_at = time.time()
+
+    def current(self, task_id):
+        if task_id in self.changes:
+            return self.changes[task_id]
+        position = self.snapshot.find(task_id)
+        if position is None:
+            return None
+        return self.snapshot.row(position)[1:]
+
+    def apply(self, task_id, value):
+        previous = self.current(task_id)
+        self.size += (value is not None) - (previous is not None)
+        self.changes[task_id] = value
+        if value is not None and (previous is None or previous[0] != value[0]):
+            self.added[value[0]].append(task_id)
+
+
+class TaskCatalogue:
+    """
+    The tasks kept in memory by every worker, serving `/tasks/<id>` and the
+    random pick of `/tasks/get` without a query.
+
+    The catalogue is loaded by a background thread when the worker starts,
+    until then reads go to the database. With TASK_CATALOGUE_PATH it is a
+    file that every worker maps, the first worker to find it missing writes
+    it, and all of them share one copy in the page cache. Every TASK_CATALOGUE_POLL_INTERVAL
+    seconds it fetches the tasks whose `updated_at` changed and counts the
+    tasks. Writes of this process are applied immediately, those of other
+    workers once polled, and a count that does not match (a task deleted
+    elsewhere) or more than TASK_CATALOGUE_MAX_CHANGES changes reload the
+    whole catalogue. A shared file is then rebuilt by one worker, and the
+    others map the new version when they poll.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._state = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["TASK_CATALOGUE_ENABLED"]
+        self.poll_interval = app.config["TASK_CATALOGUE_POLL_INTERVAL"]
+        # Rows committed late can carry an earlier `updated_at` (now() is the transaction start on Postgres)
+        self.poll_overlap = timedelta(seconds=app.config["TASK_CATALOGUE_POLL_OVERLAP"])
+        self.max_changes = app.config["TASK_CATALOGUE_MAX_CHANGES"]
+        self.path = app.config["TASK_CATALOGUE_PATH"]
+        self._state = None
+
+    def start(self):
+        """
+        Start loading the catalogue, called by gunicorn's post_fork and by the first read.
+        """
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # A catalogue loaded before the fork stays valid, the new thread keeps polling it
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="task-catalogue", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    if self._state is None:
+                        self.reload()
+                    else:
+                        self.refresh()
+                except Exception:
+                    self.app.logger.exception("Task catalogue refresh failed")
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def reload(self):
+        started = time.perf_counter()
+        names = dict(db.session.query(Category.id, Category.name).all())
+        if self.path:
+            state = self._state
+            version = self._file_version()
+            # Missing, or stale and not replaced since this worker mapped it
+            if version is None or (state is not None and state.version == version):
+                self.rebuild(seen_version=version)
+            snapshot, header = map_snapshot(self.path)
+            version = header["version"]
+            watermark = datetime.fromisoformat(header["watermark"]) if header["watermark"] else None
+        else:
+            snapshot, watermark = load_snapshot()
+            version = None
+
+        with self._lock:
+            self._state = CatalogueState(snapshot, names, watermark, version)
+        self.app.logger.info(
+            f"Task catalogue loaded: {len(snapshot)} tasks in {time.perf_counter() - started:.2f} s",
+            extra={"catalogue_bytes": sum(snapshot.nbytes().values()), "catalogue_version": version},
+        )
+
+    def rebuild(self, seen_version=None, force=False):
+        """
+        Write the catalogue file from the tasks table, workers map the new
+        version at their next poll. One process rebuilds at a time, and unless
+        `force` is set nothing is done if the file is no longer `seen_version`:
+        another worker rebuilt it meanwhile.
+        """
+        # POSIX only, imported here so that the catalogue works in memory everywhere
+        import fcntl
+
+        with open(f"{self.path}.lock", "a") as lock:
+            # Released when the file is closed
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not force and self._file_version() != seen_version:
+                return False
+            snapshot, watermark = load_snapshot()
+            write_snapshot(self.path, snapshot, time.time_ns(), watermark)
+        return True
+
+    def _file_version(self):
+        try:
+            return read_header(self.path)["version"]
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        state = self._state
+        if self.path and self._file_version() != state.version:
+            # Rebuilt by another worker or `flask catalogue rebuild`
+            self.reload()
+            return
+
+        names = dict(db.session.query(Category.id, Category.name).all())
+        query = db.session.query(Task.id, Task.category_id, Task.description, Task.updated_at)
+        if state.watermark is not None:
+            query = query.filter(Task.updated_at >= state.watermark - self.poll_overlap)
+        rows = query.all()
+        count = db.session.query(func.count(Task.id)).scalar()
+
+        with self._lock:
+            state.names = names
+            for task_id, category_id, description, updated_at in rows:
+                if state.current(task_id) != (category_id, description):
+                    state.apply(task_id, (category_id, description))
+                if updated_at is not None and (state.watermark is None or updated_at > state.watermark):
+                    state.watermark = updated_at
+            stale = count != state.size or len(state.changes) > self.max_changes
+        if stale:
+            self.reload()
+
+    def get(self, task_id):
+        """
+        The task as returned by the API, None if it is unknown or the catalogue is not loaded.
+        """
+        state = self._ready_state()
+        if state is None:
+            return None
+        value = state.current(task_id)
+        if value is None or value[0] not in state.names:
+            return None
+        return {
+            "id": task_id,
+            "description": value[1],
+            "category": state.names[value[0]],
+        }
+
+    def choose(self, category_id, attempts=8):
+        """
+        A random task of the category, None if it has none or the catalogue is not loaded.
+        """
+        state = self._ready_state()
+        if state is None or category_id not in state.names:
+            return None
+        positions = state.snapshot.positions.get(category_id, ())
+        added = state.added.get(category_id, ())
+        total = len(positions) + len(added)
+        for _ in range(min(attempts, total)):
+            index = random.randrange(total)
+            task_id = state.snapshot.ids[positions[index]] if index < len(positions) else added[index - len(positions)]
+            value = state.current(task_id)
+            # Picked from the snapshot or an earlier change, the task may since have moved or gone
+            if value is not None and value[0] == category_id:
+                return {
+                    "id": task_id,
+                    "description": value[1],
+                    "category": state.names[category_id],
+                }
+        return None
+
+    def _ready_state(self):
+        if not self.enabled:
+            return None
+        self.start()
+        return self._state
+
+    def index(self, task_id, category_id, description):
+        with self._lock:
+            if self._state is not None:
+                self._state.apply(task_id, (category_id, description))
+
+    def remove(self, task_id):
+        with self._lock:
+            if self._state is not None and self._state.current(task_id) is not None:
+                self._state.apply(task_id, None)
+
+    def invalidate(self):
+        """
+        Poll now, e.g. after categories changed.
+        """
+        self._wakeup.set()
+
+    def stats(self):
+        state = self._state
+        if state is None:
+            return {"enabled": self.enabled, "loaded": False}
+        sizes = state.snapshot.nbytes()
+        total = sum(sizes.values())
+        return {
+            "enabled": self.enabled,
+            "loaded": True,
+            "loaded_at": state.loaded_at,
+            "path": self.path,
+            "version": state.version,
+            "tasks": state.size,
+            "changes": len(state.changes),
+            "categories": len(state.names),
+            "bytes": sizes,
+            "bytes_per_task": round(total / len(state.snapshot), 1) if len(state.snapshot) else 0,
+            "bytes_per_million_tasks": total * 1000000 // len(state.snapshot) if len(state.snapshot) else 0,
+        }
+
+task_catalogue = TaskCatalogue()
@@ -0,0 +1,61 @@
+import hmac
+
+import msgpack
+from flask import current_app, g, jsonify, request
+
+MSGPACK_MIMETYPE = "application/msgpack"
+# Set by Talisman, only meaningful to browsers
+BROWSER_HEADERS = (
+    "Content-Security-Policy",
+    "Content-Security-Policy-Report-Only",
+    "Feature-Policy",
+    "Permissions-Policy",
+    "Document-Policy",
+    "X-Frame-Options",
+    "X-XSS-Protection",
+    "X-Content-Type-Options",
+    "X-Download-Options",
+    "Strict-Transport-Security",
+    "Referrer-Policy",
+)
+
+def is_bot_client():
+    """
+    True if the request carries one of the BOT_API_KEYS in `X-Bot-Key`.
+    """
+    key = request.headers.get("X-Bot-Key")
+    if not key:
+        return False
+    return any(hmac.compare_digest(key.encode(), allowed.encode()) for allowed in current_app.config["BOT_API_KEYS"])
+
+def task_response(task, status=200):
+    """
+    Respond with a task, by default as a JSON object. Clients that only need
+    the id and the description get `[id, description]`, as MessagePack with
+    `Accept: application/msgpack` or as JSON with `?compact=1`.
+    """
+    if is_bot_client():
+        g.skip_browser_headers = True
+
+    accept = request.accept_mimetypes
+    if accept[MSGPACK_MIMETYPE] > accept["application/json"]:
+        body = msgpack.packb([task["id"], task["description"]])
+        return current_app.response_class(body, status=status, mimetype=MSGPACK_MIMETYPE)
+
+    if request.args.get("compact") == "1":
+        return jsonify([task["id"], task["description"]]), status
+
+    return jsonify(task), status
+
+def strip_browser_headers(response):
+    """
+    Leave Talisman's browser-only headers out of responses to authenticated
+    bot clients. HTTPS is still enforced.
+
+    Register it before Talisman: after_request hooks run in reverse order, so
+    it then sees the headers Talisman has set.
+    """
+    if g.get("skip_browser_headers"):
+        for header in BROWSER_HEADERS:
+            response.headers.pop(header, None)
+    return response
@@ -1,5 +1,89 @@
+from functools import wraps
+
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_migrate import Migrate
+from sqlalchemy import event
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs of `read_only` controllers to the "replica" bind, if configured.
+
+    Once anything has been written in the current request, every following
+    query sticks to the primary so the request reads its own writes.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_app_context()
+            and g.get("read_replica")
+            and not g.get("stick_to_primary")
+            and "replica" in self._db.engines
+        ):
+            return self._db.engines["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+migrate = Migrate()
+
+def read_only(func):
+    """
+    Allow the queries of a controller to be served by the read replica.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = g.get("read_replica", False)
+        g.read_replica = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            g.read_replica = previous
+    return wrapper
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary_after_flush(session, flush_context):
+    if has_app_context():
+        g.stick_to_primary = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _stick_to_primary_after_write(orm_execute_state):
+    if has_app_context() and not orm_execute_state.is_select:
+        g.stick_to_primary = True
+
+def insert(model):
+    """
+    Build a dialect-specific INSERT that supports ON CONFLICT clauses.
+    """
+    if db.engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model)
+
+    from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+    return postgresql_insert(model)
+
+def configure_sqlite(app):
+    """
+    Tune every SQLite engine of the app for concurrent workers.
+    """
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": app.config["SQLITE_BUSY_TIMEOUT"],
+        "mmap_size": app.config["SQLITE_MMAP_SIZE"],
+        "cache_size": app.config["SQLITE_CACHE_SIZE"],
+        "foreign_keys": "ON" if app.config["SQLITE_FOREIGN_KEYS"] else "OFF",
+    }
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
-db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", set_pragmas)
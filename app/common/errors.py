@@ -0,0 +1,49 @@
+import sys
+from functools import wraps
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from flask import current_app
+
+from app.common.db import db
+from app.common.pool import pool_monitor
+from app.common.exceptions import CustomAPIException, DatabaseError, AIGenerationError
+
+def release_session(error=None):
+    """
+    Roll back the request's session so its connection goes back to the pool
+    clean, not in a failed transaction. Called by the app's error handlers.
+    """
+    pool_monitor.record_error(error)
+    try:
+        db.session.rollback()
+    except Exception as e:
+        # The connection is unusable, drop the session and the connection with it
+        current_app.logger.error(f"Rollback failed: {str(e)}")
+        db.session.remove()
+
+def handle_errors(controller):
+    """
+    Turn database and OpenAI failures of a controller into API exceptions,
+    chained to the original error, after rolling back the session.
+
+    API exceptions such as NotFoundError propagate untouched, and nothing
+    runs on the success path besides the `try` itself.
+    """
+    @wraps(controller)
+    def wrapper(*args, **kwargs):
+        try:
+            return controller(*args, **kwargs)
+        except CustomAPIException:
+            raise
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise DatabaseError(f"Database error: {e}") from e
+        except Exception as e:
+            db.session.rollback()
+            # openai is imported lazily, if it is not loaded no OpenAIError can have been raised
+            openai = sys.modules.get("openai")
+            if openai is not None and isinstance(e, openai.OpenAIError):
+                raise AIGenerationError(f"Failed to generate task: {e}") from e
+            raise
+    return wrapper
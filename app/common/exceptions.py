@@ -32,3 +32,11 @@ class AIGenerationError(CustomAPIException):
 class AlreadyExistsError(CustomAPIException):
     """Exception for entity already exists."""
     status_code = 409
+
+class GenerationBudgetExceededError(CustomAPIException):
+    """Exception for the global OpenAI budget being used up."""
+    status_code = 429
+
+class ForbiddenError(CustomAPIException):
+    """Exception for missing or wrong credentials."""
+    status_code = 403
@@ -0,0 +1,290 @@
+import atexit
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from app.common.openai import openai_client
+from app.common.budget import generation_budget
+from app.common.log import request_logger
+
+class DiskGenerations:
+    """
+    SQLite file on local disk, shared by the workers of one machine.
+    """
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS generations (
+            key TEXT NOT NULL,
+            window_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            used_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_generations_key ON generations (key, window_id)",
+        "CREATE INDEX IF NOT EXISTS ix_generations_window_id ON generations (window_id)",
+        "CREATE INDEX IF NOT EXISTS ix_generations_used_at ON generations (used_at)",
+        "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    ]
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3 connections are not shared between threads, opening one is cheap
+        connection = sqlite3.connect(self.path, timeout=5)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key, window):
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT content FROM generations WHERE key = ? AND window_id = ?", (key, window)
+            ).fetchall()
+        return [content for content, in rows]
+
+    def touch(self, used):
+        with self._connect() as connection:
+            connection.executemany(
+                "UPDATE generations SET used_at = ? WHERE key = ?",
+                [(used_at, key) for (key, _), used_at in used.items()],
+            )
+
+    def add(self, key, window, content, per_key):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM generations WHERE window_id < ?", (window,))
+            connection.execute(
+                "INSERT INTO generations (key, window_id, content, used_at) VALUES (?, ?, ?, ?)",
+                (key, window, content, time.time()),
+            )
+            # Least recently used keys go first once the cache is full
+            connection.execute(
+                """
+                DELETE FROM generations WHERE rowid IN (
+                    SELECT rowid FROM generations ORDER BY used_at
+                    LIMIT max((SELECT count(*) FROM generations) - ?, 0)
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def count(self, counts):
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                counts.items(),
+            )
+
+    def stats(self):
+        with self._connect() as connection:
+            entries = connection.execute("SELECT count(*) FROM generations").fetchone()[0]
+            counters = dict(connection.execute("SELECT name, value FROM stats").fetchall())
+        return {"entries": entries, **counters}
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM generations")
+            connection.execute("DELETE FROM stats")
+
+
+class RedisGenerations:
+    """
+    One Redis list per prompt and window, expiring with the window. A sorted
+    set of last use times evicts the least recently used lists past the cap.
+    """
+    PREFIX = "generation_cache:"
+    LRU_KEY = "generation_cache:lru"
+    STATS_KEY = "generation_cache:stats"
+
+    def __init__(self, uri, max_entries, window_seconds):
+        import redis
+
+        self.client = redis.Redis.from_url(uri, decode_responses=True)
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+
+    def _key(self, key, window):
+        return f"{self.PREFIX}{key}:{window}"
+
+    def get(self, key, window):
+        return self.client.lrange(self._key(key, window), 0, -1)
+
+    def touch(self, used):
+        # xx: a list evicted since it was read stays out of the LRU set
+        self.client.zadd(
+            self.LRU_KEY,
+            {self._key(key, window): used_at for (key, window), used_at in used.items()},
+            xx=True,
+        )
+
+    def add(self, key, window, content, per_key):
+        list_key = self._key(key, window)
+        pipe = self.client.pipeline()
+        pipe.rpush(list_key, content)
+        # Concurrent misses can push more than per_key entries
+        pipe.ltrim(list_key, 0, per_key - 1)
+        pipe.expire(list_key, self.window_seconds)
+        pipe.zadd(self.LRU_KEY, {list_key: time.time()})
+        pipe.zcard(self.LRU_KEY)
+        size = pipe.execute()[-1]
+
+        # Entries are capped per list, the LRU set caps the number of lists
+        excess = size - max(self.max_entries // per_key, 1)
+        if excess > 0:
+            evicted = [member for member, _ in self.client.zpopmin(self.LRU_KEY, excess)]
+            self.client.delete(*evicted)
+
+    def count(self, counts):
+        pipe = self.client.pipeline()
+        for name, value in counts.items():
+            pipe.hincrby(self.STATS_KEY, name, value)
+        pipe.execute()
+
+    def stats(self):
+        counters = {name: int(value) for name, value in self.client.hgetall(self.STATS_KEY).items()}
+        pipe = self.client.pipeline()
+        for member in self.client.zrange(self.LRU_KEY, 0, -1):
+            pipe.llen(member)
+        return {"entries": sum(pipe.execute()), **counters}
+
+    def clear(self):
+        members = self.client.zrange(self.LRU_KEY, 0, -1)
+        self.client.delete(self.LRU_KEY, self.STATS_KEY, *members)
+
+
+class GenerationCache:
+    """
+    Response cache in front of `openai_client.chat.completions.create`.
+
+    Identical requests (same model, parameters and messages, e.g. every
+    generation for one category) share up to GENERATION_CACHE_PER_KEY
+    completions per GENERATION_CACHE_WINDOW seconds: the first ones call the
+    model, once the window holds enough of them a random one is served.
+
+    Hit and miss counters and the last use of each hit key are kept in
+    memory and written to the store at most every FLUSH_INTERVAL seconds, so
+    a lookup writes nothing.
+    """
+    FLUSH_INTERVAL = 10
+
+    def __init__(self):
+        self.enabled = False
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+        self._pending = Counter()
+        self._used = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        # Write the last counts and uses to the store before the process exits
+        atexit.register(self.flush)
+
+    def init_app(self, app):
+        backend = app.config["GENERATION_CACHE_BACKEND"]
+        self.enabled = backend != "none"
+        self.per_key = app.config["GENERATION_CACHE_PER_KEY"]
+        self.window_seconds = app.config["GENERATION_CACHE_WINDOW"]
+        max_entries = app.config["GENERATION_CACHE_MAX_ENTRIES"]
+
+        if backend == "redis":
+            self.store = RedisGenerations(app.config["GENERATION_CACHE_REDIS_URI"], max_entries, self.window_seconds)
+        elif backend == "disk":
+            self.store = DiskGenerations(app.config["GENERATION_CACHE_PATH"], max_entries)
+        elif backend != "none":
+            raise ValueError(f"Unknown GENERATION_CACHE_BACKEND: {backend}")
+
+    def _key(self, params):
+        payload = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _window(self):
+        return int(time.time() // self.window_seconds)
+
+    def lookup(self, params):
+        """
+        Return a cached completion for the request, or None if the model must be called.
+        """
+        if not self.enabled:
+            return None
+
+        key, window = self._key(params), self._window()
+        entries = self.store.get(key, window)
+        if len(entries) >= self.per_key:
+            with self._lock:
+                self._used[(key, window)] = time.time()
+            self._count("hits")
+            return random.choice(entries)
+
+        self._count("misses")
+        return None
+
+    def add(self, params, content):
+        if self.enabled:
+            self.store.add(self._key(params), self._window(), content, self.per_key)
+
+    def create(self, **params):
+        """
+        Return (content, cached) for a chat completion request.
+        """
+        content = self.lookup(params)
+        if content is not None:
+            return content, True
+
+        content = self._complete(params)
+        self.add(params, content)
+        return content, False
+
+    def _complete(self, params):
+        with generation_budget.reserve() as lease, request_logger.openai_call(model=params["model"]) as timing:
+            chat_completion = openai_client.chat.completions.create(**params)
+            lease.used(chat_completion.usage)
+            if chat_completion.usage is not None:
+                timing["tokens"] = chat_completion.usage.total_tokens
+        return chat_completion.choices[0].message.content.strip()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self._pending[name] += 1
+            due = time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            used, self._used = self._used, {}
+            self._flushed_at = time.monotonic()
+        if used:
+            self.store.touch(used)
+        if pending:
+            self.store.count(pending)
+
+    def stats(self):
+        if not self.enabled:
+            return {}
+        self.flush()
+        return self.store.stats()
+
+    def clear(self):
+        if self.enabled:
+            with self._lock:
+                self._pending.clear()
+                self._used.clear()
+            self.store.clear()
+
+generation_cache = GenerationCache()
@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+class MemoryTableVersions:
+    """
+    Per-process counters, only correct with a single worker.
+    """
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._started_at = int(time.time())
+
+    def get(self, tables):
+        with self._lock:
+            return [self._versions.get(table, (0, self._started_at)) for table in tables]
+
+    def bump(self, tables):
+        now = int(time.time())
+        with self._lock:
+            for table in tables:
+                version, _ = self._versions.get(table, (0, self._started_at))
+                self._versions[table] = (version + 1, now)
+
+
+class RedisTableVersions:
+    """
+    Counters shared by every worker, one Redis hash per table.
+    """
+    PREFIX = "http_cache:tables:"
+
+    def __init__(self, uri):
+        import redis
+
+        self.client = redis.Redis.from_url(uri, decode_responses=True)
+
+    def get(self, tables):
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.hmget(self.PREFIX + table, "version", "modified_at")
+        rows = pipe.execute()
+
+        missing = [table for table, (version, _) in zip(tables, rows) if version is None]
+        if missing:
+            # Seed with the current time so that a flushed Redis never reissues an old ETag
+            now = int(time.time())
+            pipe = self.client.pipeline()
+            for table in missing:
+                pipe.hsetnx(self.PREFIX + table, "version", 0)
+                pipe.hsetnx(self.PREFIX + table, "modified_at", now)
+            pipe.execute()
+            return self.get(tables)
+
+        return [(int(version), int(modified_at)) for version, modified_at in rows]
+
+    def bump(self, tables):
+        now = int(time.time())
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.hincrby(self.PREFIX + table, "version", 1)
+            pipe.hset(self.PREFIX + table, "modified_at", now)
+        pipe.execute()
+
+
+class HttpCache:
+    """
+    ETag / Last-Modified handling for read endpoints.
+
+    Every committed change bumps a version counter for the tables it touched,
+    so a conditional request is answered from the counters alone and a 304
+    never touches the database.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.versions = None
+
+    def init_app(self, app):
+        self.enabled = app.config["HTTP_CACHE_ENABLED"]
+        self.cache_control = json.loads(app.config["HTTP_CACHE_CONTROL"] or "{}")
+        if not self.enabled:
+            return
+
+        if app.config["HTTP_CACHE_REDIS_URI"]:
+            self.versions = RedisTableVersions(app.config["HTTP_CACHE_REDIS_URI"])
+        else:
+            self.versions = MemoryTableVersions()
+
+    def validators(self, tables):
+        versions = self.versions.get(tables)
+        etag = "-".join(f"{version}.{modified_at}" for version, modified_at in versions)
+        last_modified = datetime.fromtimestamp(max(modified_at for _, modified_at in versions), timezone.utc)
+        return etag, last_modified
+
+    def bump(self, tables):
+        if self.enabled and tables:
+            self.versions.bump(sorted(tables))
+
+http_cache = HttpCache()
+
+def conditional(*tables, cache_control="no-cache"):
+    """
+    Answer conditional GETs for a view whose response depends only on `tables`.
+
+    The ETag comes from the primary's commits, so a full response is read from
+    the primary too: a lagging replica would otherwise pin an old body to the
+    current ETag. A 304 still never touches the database.
+
+    Last-Modified only has a one-second resolution: it is left out while
+    its second is not over, so a later write in the same second can never
+    be hidden behind If-Modified-Since. If-None-Match wins when both are sent.
+
+    `cache_control` can be overridden per endpoint with HTTP_CACHE_CONTROL.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not http_cache.enabled:
+                return view(*args, **kwargs)
+
+            etag, last_modified = http_cache.validators(tables)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(request.if_modified_since) and last_modified <= request.if_modified_since
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                g.stick_to_primary = True
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified.timestamp() < int(time.time()):
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = http_cache.cache_control.get(request.endpoint, cache_control)
+            return response
+        return wrapper
+    return decorator
+
+def _served(column):
+    # Bookkeeping columns are declared with info={"http_cache": False}
+    return column.info.get("http_cache", True)
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    changed = session.info.setdefault("changed_tables", set())
+    for instance in (*session.new, *session.deleted):
+        changed.add(instance.__table__.name)
+    for instance in session.dirty:
+        state = inspect(instance)
+        if any(
+            _served(instance.__table__.c[attr.key])
+            for attr in state.attrs
+            if attr.key in instance.__table__.c and attr.history.has_changes()
+        ):
+            changed.add(instance.__table__.name)
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_executed_tables(orm_execute_state):
+    # Bulk statements that only touch bookkeeping columns run with execution_options(http_cache=False)
+    if not orm_execute_state.execution_options.get("http_cache", True):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed = orm_execute_state.session.info.setdefault("changed_tables", set())
+        changed.add(orm_execute_state.statement.table.name)
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    http_cache.bump(session.info.pop("changed_tables", None))
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session):
+    session.info.pop("changed_tables", None)
@@ -0,0 +1,246 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import g
+
+from app.common.exceptions import CustomAPIException
+from app.common.log import current_request_id
+
+JOBS = {}
+
+def register_job(name):
+    """
+    Register a function that can be run in the background under `name`.
+    """
+    def decorator(func):
+        JOBS[name] = func
+        return func
+    return decorator
+
+def _should_retry(e):
+    # Client errors (not found, validation...) will fail the same way again
+    return not isinstance(e, CustomAPIException) or e.status_code >= 500
+
+
+class BaseJobQueue:
+    def __init__(self, app):
+        self.app = app
+        self.max_retries = app.config["JOB_MAX_RETRIES"]
+        self.retry_backoff = app.config["JOB_RETRY_BACKOFF"]
+        self.retry_backoff_max = app.config["JOB_RETRY_BACKOFF_MAX"]
+        self.result_ttl = app.config["JOB_RESULT_TTL"]
+
+    def enqueue(self, name, **kwargs):
+        if name not in JOBS:
+            raise ValueError(f"Unknown job: {name}")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "kwargs": kwargs,
+            "status": "queued",
+            "attempts": 0,
+            # Logged with the job's records, ties them to the request that queued it
+            "request_id": current_request_id(),
+            "result": None,
+            "progress": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self.save(job)
+        self.push(job["id"])
+        return job
+
+    def run(self, job_id):
+        job = self.get(job_id)
+        if not job:
+            return
+
+        job["status"] = "running"
+        job["attempts"] += 1
+        self.save(job)
+
+        try:
+            with self.app.app_context():
+                g.request_id = job.get("request_id")
+                g.job = job
+                job["result"] = JOBS[job["name"]](**job["kwargs"])
+            job["status"] = "finished"
+            job["error"] = None
+        except Exception as e:
+            job["error"] = str(e)
+            if _should_retry(e) and job["attempts"] <= self.max_retries:
+                job["status"] = "queued"
+                self.save(job)
+                self.push(job_id, delay=self.retry_delay(job["attempts"]))
+                return
+            job["status"] = "failed"
+
+        job["finished_at"] = time.time()
+        self.save(job)
+
+    def retry_delay(self, attempts):
+        """
+        Seconds before the next attempt, doubling after every failed one.
+        """
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+
+    def report_progress(self, progress):
+        """
+        Store the progress of the job running in the current app context,
+        returned by GET /jobs/<job_id> while it runs. Does nothing outside a job.
+        """
+        job = g.get("job")
+        if job is None:
+            return
+        job["progress"] = progress
+        self.save(job)
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def save(self, job):
+        raise NotImplementedError
+
+    def push(self, job_id, delay=0):
+        raise NotImplementedError
+
+
+class ThreadJobQueue(BaseJobQueue):
+    """
+    In-process backend for tests and single-node deployments.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["JOB_CONCURRENCY"],
+            thread_name_prefix="job",
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            self._prune()
+
+    def push(self, job_id, delay=0):
+        if delay > 0:
+            timer = threading.Timer(delay, self._executor.submit, args=(self.run, job_id))
+            timer.daemon = True
+            timer.start()
+            return
+        self._executor.submit(self.run, job_id)
+
+    def _prune(self):
+        expired_before = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] and job["finished_at"] < expired_before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class RedisJobQueue(BaseJobQueue):
+    """
+    Redis backend, jobs are run by `python -m app.worker`.
+    """
+    QUEUE_KEY = "jobs:queue"
+    # Retries waiting for their delay, scored by when they are due
+    DELAYED_KEY = "jobs:delayed"
+
+    def __init__(self, app):
+        super().__init__(app)
+        import redis
+
+        self.client = redis.Redis.from_url(app.config["JOB_QUEUE_REDIS_URI"], decode_responses=True)
+
+    def _key(self, job_id):
+        return f"jobs:{job_id}"
+
+    def get(self, job_id):
+        raw = self.client.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    def save(self, job):
+        self.client.set(self._key(job["id"]), json.dumps(job), ex=self.result_ttl)
+
+    def push(self, job_id, delay=0):
+        if delay > 0:
+            self.client.zadd(self.DELAYED_KEY, {job_id: time.time() + delay})
+            return
+        self.client.rpush(self.QUEUE_KEY, job_id)
+
+    def _push_due(self):
+        for job_id in self.client.zrangebyscore(self.DELAYED_KEY, 0, time.time()):
+            # Only the worker whose ZREM succeeds queues it
+            if self.client.zrem(self.DELAYED_KEY, job_id):
+                self.client.rpush(self.QUEUE_KEY, job_id)
+
+    def work(self, concurrency=None):
+        """
+        Run jobs from the queue until interrupted, at most `concurrency` at a time.
+        """
+        concurrency = concurrency or self.app.config["JOB_CONCURRENCY"]
+        stop = threading.Event()
+
+        def loop():
+            while not stop.is_set():
+                self._push_due()
+                item = self.client.blpop(self.QUEUE_KEY, timeout=1)
+                if item:
+                    self.run(item[1])
+
+        threads = [threading.Thread(target=loop, name=f"worker-{i}") for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+BACKENDS = {
+    "thread": ThreadJobQueue,
+    "redis": RedisJobQueue,
+}
+
+class JobQueue:
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        backend = app.config["JOB_QUEUE_BACKEND"]
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown job queue backend: {backend}")
+        self.backend = BACKENDS[backend](app)
+        app.extensions["job_queue"] = self
+
+    def enqueue(self, name, **kwargs):
+        return self.backend.enqueue(name, **kwargs)
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def report_progress(self, progress):
+        self.backend.report_progress(progress)
+
+    def work(self, concurrency=None):
+        if not isinstance(self.backend, RedisJobQueue):
+            raise RuntimeError("The worker requires JOB_QUEUE_BACKEND=redis.")
+        self.backend.work(concurrency)
+
+job_queue = JobQueue()
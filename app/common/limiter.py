@@ -1,11 +1,163 @@
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import os
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
+from limits.storage import MovingWindowSupport, Storage
+from limits.storage.redis import RedisStorage
+from limits.strategies import STRATEGIES, FixedWindowRateLimiter
 
+# Storage is read from RATELIMIT_STORAGE_URI in the app config
 limiter = Limiter(
     get_remote_address,
-    storage_uri=os.getenv("REDIS_RATE_LIMITER_URI")
-)
\ No newline at end of file
+)
+
+class ShardedRedisStorage(Storage, MovingWindowSupport):
+    """
+    Rate limit counters spread over several Redis nodes by consistent hashing
+    on the key, `sharded+redis://host1:6379/0,host2:6379/0`. Adding or
+    removing a node only moves the keys of its share of the ring.
+    """
+    STORAGE_SCHEME = ["sharded+redis"]
+    DEPENDENCIES = ["redis"]
+    # Points per node on the ring, evens out the share of each node
+    VIRTUAL_NODES = 100
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        nodes = uri.split("://", 1)[1].split(",")
+        self.nodes = [RedisStorage(f"redis://{node}", wrap_exceptions=wrap_exceptions, **options) for node in nodes]
+        self._ring = sorted(
+            (self._hash(f"{node}#{point}"), index)
+            for index, node in enumerate(nodes)
+            for point in range(self.VIRTUAL_NODES)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node_for(self, key):
+        position = bisect.bisect(self._points, self._hash(key)) % len(self._ring)
+        return self.nodes[self._ring[position][1]]
+
+    @property
+    def base_exceptions(self):
+        return self.nodes[0].base_exceptions
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        return self.node_for(key).incr(key, expiry, elastic_expiry=elastic_expiry, amount=amount)
+
+    def get(self, key):
+        return self.node_for(key).get(key)
+
+    def get_expiry(self, key):
+        return self.node_for(key).get_expiry(key)
+
+    def clear(self, key):
+        return self.node_for(key).clear(key)
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        return self.node_for(key).acquire_entry(key, limit, expiry, amount)
+
+    def get_moving_window(self, key, limit, expiry):
+        return self.node_for(key).get_moving_window(key, limit, expiry)
+
+    def check(self):
+        return all(node.check() for node in self.nodes)
+
+    def reset(self):
+        return sum(node.reset() or 0 for node in self.nodes)
+
+
+class LeasedFixedWindowRateLimiter(FixedWindowRateLimiter):
+    """
+    Fixed window limiter that takes hits from the shared storage in leases.
+
+    A worker reserves several hits of a key's window at once with one INCRBY
+    and admits requests from that lease in memory. Far from the limit a
+    lease is LEASE_FRACTION of what remains in the window, at most
+    LEASE_MAX hits. Near it leases shrink to a single hit, so every request
+    asks the storage, like the plain fixed window.
+
+    Every admitted hit was counted in the storage within its window first,
+    so no more than the limit is ever admitted per window. Hits leased by a
+    worker but not used are lost for the window. A client spread over W
+    workers is therefore admitted at least `limit - (W - 1) * LEASE_MAX`
+    times per window.
+    """
+    lease_fraction = 0.1
+    lease_max = 10
+    # Leases held per worker, the least recently used are dropped beyond it
+    max_keys = 10000
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self._leases = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.storage_hits = 0
+
+    def hit(self, item, *identifiers, cost=1):
+        key = item.key_for(*identifiers)
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease["expires_at"] > now and lease["hits"] >= cost:
+                self._leases.move_to_end(key)
+                lease["hits"] -= cost
+                self.local_hits += 1
+                return True
+            remaining = lease["remaining"] if lease is not None and lease["expires_at"] > now else item.amount
+
+        size = max(cost, min(self.lease_max, int(remaining * self.lease_fraction)))
+        count = self.storage.incr(key, item.get_expiry(), elastic_expiry=False, amount=size)
+        # Part of the lease over the limit is not usable
+        granted = min(size, item.amount - (count - size))
+        self.storage_hits += 1
+        if granted < cost:
+            with self._lock:
+                self._leases.pop(key, None)
+            return False
+
+        expires_at = self.storage.get_expiry(key)
+        with self._lock:
+            self._leases[key] = {
+                "hits": granted - cost,
+                "remaining": item.amount - count,
+                "expires_at": expires_at,
+            }
+            self._leases.move_to_end(key)
+            # Expired leases are never used again and age out first. Unused
+            # hits of an evicted lease are lost, which only admits fewer requests
+            while len(self._leases) > self.max_keys:
+                self._leases.popitem(last=False)
+        return True
+
+    def clear(self, item, *identifiers):
+        with self._lock:
+            self._leases.pop(item.key_for(*identifiers), None)
+        super().clear(item, *identifiers)
+
+STRATEGIES["leased-fixed-window"] = LeasedFixedWindowRateLimiter
+
+def configure_rate_limits(app):
+    """
+    Set up the limiter, RATELIMIT_STRATEGY=leased-fixed-window enables the
+    leases of LeasedFixedWindowRateLimiter.
+    """
+    # A subclass per app, the strategy is looked up once by init_app and
+    # other apps of the process keep their own lease settings
+    STRATEGIES["leased-fixed-window"] = type(
+        LeasedFixedWindowRateLimiter.__name__,
+        (LeasedFixedWindowRateLimiter,),
+        {
+            "lease_fraction": app.config["RATELIMIT_LEASE_FRACTION"],
+            "lease_max": app.config["RATELIMIT_LEASE_MAX"],
+        },
+    )
+    limiter.init_app(app)
@@ -0,0 +1,237 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_app_context, has_request_context, request
+from flask.logging import default_handler
+from sqlalchemy import event
+
+from app.common.db import db
+
+# Children of the Flask app logger ("app"), they share its handler
+access_logger = logging.getLogger("app.access")
+sql_logger = logging.getLogger("app.sql")
+openai_logger = logging.getLogger("app.openai")
+
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+def current_request_id():
+    # Background jobs run in an app context with the id of the request that queued them
+    return g.get("request_id") if has_app_context() else None
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps records with the id of the request being handled. Runs in the
+    thread that logs, before the record is queued.
+    """
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, `extra` fields of the record included.
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+class ForkSafeQueueHandler(QueueHandler):
+    """
+    Hands records to a QueueListener thread, which formats and writes them.
+
+    Threads do not survive a fork, so a worker forked from a preloaded
+    master starts its own listener when it logs for the first time.
+    """
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Formatting is left to the listener thread, only the arguments and the traceback are resolved here
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        super().enqueue(record)
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+class RequestLogger:
+    """
+    Structured logging for the app: JSON records (LOG_FORMAT), written by a
+    background thread (LOG_QUEUE_ENABLED), each carrying the request id.
+
+    The id is taken from the `X-Request-ID` request header or generated, and
+    returned in the response header of the same name. One access record is
+    written per request, for successful ones only a sample of
+    ACCESS_LOG_SAMPLE_RATE, with the time spent in SQL and in OpenAI calls.
+    Statements slower than LOG_SLOW_QUERY_MS and every OpenAI call are
+    logged on their own with the same id.
+    """
+    def __init__(self):
+        self.handler = None
+        # Write what is still queued before the process exits
+        atexit.register(self._stop)
+
+    def init_app(self, app):
+        self.access_enabled = app.config["ACCESS_LOG_ENABLED"]
+        self.sample_rate = app.config["ACCESS_LOG_SAMPLE_RATE"]
+        self.slow_query_ms = app.config["LOG_SLOW_QUERY_MS"]
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter() if app.config["LOG_FORMAT"] == "json" else TextFormatter())
+
+        # app.logger is shared by every app of the process, replace what a previous init_app added
+        if self.handler is not None:
+            app.logger.removeHandler(self.handler)
+            self._stop()
+        app.logger.removeHandler(default_handler)
+
+        self.handler = ForkSafeQueueHandler(stream_handler) if app.config["LOG_QUEUE_ENABLED"] else stream_handler
+        self.handler.addFilter(RequestIdFilter())
+        app.logger.addHandler(self.handler)
+        app.logger.setLevel(app.config["LOG_LEVEL"])
+
+        app.before_request(self._start_request)
+        app.after_request(self._log_request)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _stop(self):
+        if isinstance(self.handler, ForkSafeQueueHandler):
+            self.handler.stop()
+
+    def _start_request(self):
+        # Ids of a proxy or the bot are kept, truncated so a client cannot flood the logs
+        g.request_id = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+        g.timings = {"sql_queries": 0, "sql_ms": 0.0, "openai_calls": 0, "openai_ms": 0.0}
+
+    def _log_request(self, response):
+        request_id = g.get("request_id")
+        if request_id is None:
+            return response
+        response.headers["X-Request-ID"] = request_id
+
+        if not self.access_enabled:
+            return response
+        # Errors are always logged, successful requests are sampled
+        if response.status_code < 400 and random.random() >= self.sample_rate:
+            return response
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "remote_addr": request.remote_addr,
+            "request_id": request_id,
+        }
+        started, timings = g.request_started, g.timings
+        if response.is_streamed:
+            # SSE and NDJSON bodies are produced after the view returns, time them until the stream is closed
+            response.call_on_close(lambda: self._write_access(fields, started, timings, None))
+        else:
+            self._write_access(fields, started, timings, response.calculate_content_length())
+        return response
+
+    def _write_access(self, fields, started, timings, response_bytes):
+        access_logger.info(
+            f"{fields['method']} {fields['path']} {fields['status']}",
+            extra={
+                **fields,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "response_bytes": response_bytes,
+                **{key: round(value, 2) for key, value in timings.items()},
+            },
+        )
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info.pop("query_started")) * 1000
+        self._add_timing("sql", elapsed)
+        if elapsed >= self.slow_query_ms:
+            sql_logger.warning(
+                "Slow query",
+                extra={"duration_ms": round(elapsed, 2), "statement": statement[:500], "executemany": executemany},
+            )
+
+    def _add_timing(self, kind, elapsed):
+        timings = g.get("timings") if has_request_context() else None
+        if timings is not None:
+            timings[f"{kind}_queries" if kind == "sql" else f"{kind}_calls"] += 1
+            timings[f"{kind}_ms"] += elapsed
+
+    @contextmanager
+    def openai_call(self, **fields):
+        """
+        Time one OpenAI call, the body can add fields such as the tokens used
+        to the yielded dict.
+        """
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._add_timing("openai", elapsed)
+            openai_logger.info("OpenAI call", extra={"duration_ms": round(elapsed, 2), **fields})
+
+request_logger = RequestLogger()
@@ -1,8 +1,11 @@
 from flask import jsonify
 
+from app.common.errors import release_session
+
 def handle_unexpected_error(app):
     @app.errorhandler(Exception)
     def handle_generic_error(e):
         app.logger.error(f"Unexpected error: {str(e)}")
+        release_session(e)
 
         return jsonify({"error": "An unexpected error occurred. Please try again later."}), 500
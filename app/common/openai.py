@@ -1,11 +1,24 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import threading
+from flask import current_app
 
-load_dotenv(override=True)
+class LazyOpenAIClient:
+    """
+    Creates the OpenAI client on first use, importing openai is the bulk of the app's import time.
+    """
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
 
-openai_client = OpenAI(
-    api_key = OPENAI_API_KEY,
-)
\ No newline at end of file
+                    self._client = OpenAI(
+                        api_key = current_app.config["OPENAI_API_KEY"],
+                        base_url = current_app.config["OPENAI_BASE_URL"],
+                    )
+        return getattr(self._client, name)
+
+openai_client = LazyOpenAIClient()
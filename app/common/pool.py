@@ -0,0 +1,106 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.common.db import db
+
+class PoolMonitor:
+    """
+    Connection pool counters per engine ("default" and "replica"), fed by
+    the pool events and by the error handlers for checkout timeouts.
+
+    A warning is logged when a pool runs out of connections, at most once
+    per POOL_EXHAUSTED_LOG_INTERVAL seconds.
+    """
+    def __init__(self):
+        self.engines = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._logged_at = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.log_interval = app.config["POOL_EXHAUSTED_LOG_INTERVAL"]
+        # DB_MAX_OVERFLOW, SQLAlchemy's default when unset
+        self.max_overflow = app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("max_overflow", 10)
+        with app.app_context():
+            for name, engine in db.engines.items():
+                name = name or "default"
+                self.engines[name] = engine
+                self._counters[name] = {
+                    "checkouts": 0,
+                    "checked_out": 0,
+                    "peak_checked_out": 0,
+                    "exhausted": 0,
+                    "timeouts": 0,
+                    "invalidated": 0,
+                }
+                self._listen(name, engine.pool)
+
+    def _listen(self, name, pool):
+        counters = self._counters[name]
+
+        @event.listens_for(pool, "checkout")
+        def _checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                counters["checkouts"] += 1
+                counters["checked_out"] += 1
+                counters["peak_checked_out"] = max(counters["peak_checked_out"], counters["checked_out"])
+                exhausted = counters["checked_out"] >= self._capacity(pool)
+                if exhausted:
+                    counters["exhausted"] += 1
+            if exhausted:
+                self._warn(name, "Connection pool exhausted")
+
+        @event.listens_for(pool, "checkin")
+        def _checkin(dbapi_connection, connection_record):
+            with self._lock:
+                counters["checked_out"] -= 1
+
+        @event.listens_for(pool, "invalidate")
+        def _invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                counters["invalidated"] += 1
+
+    def _capacity(self, pool):
+        # Only QueuePool has a limit, the other pools hand out a connection per thread
+        if isinstance(pool, QueuePool) and self.max_overflow >= 0:
+            return pool.size() + self.max_overflow
+        return float("inf")
+
+    def _warn(self, name, message):
+        now = time.monotonic()
+        if now - self._logged_at.get(name, 0) >= self.log_interval:
+            self._logged_at[name] = now
+            self.app.logger.warning(f"{message} ({name}): {self.engines[name].pool.status()}")
+
+    def record_error(self, error):
+        """
+        Count `error` if it, or the error it was raised from, is a pool checkout timeout.
+        """
+        while error is not None:
+            if isinstance(error, PoolTimeoutError):
+                with self._lock:
+                    for name, engine in self.engines.items():
+                        if engine.pool.checkedout() >= self._capacity(engine.pool):
+                            self._counters[name]["timeouts"] += 1
+                            self._warn(name, "Timed out waiting for a pooled connection")
+                return
+            error = error.__cause__
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "pool": type(engine.pool).__name__,
+                    "size": engine.pool.size() if hasattr(engine.pool, "size") else None,
+                    "capacity": None if self._capacity(engine.pool) == float("inf") else self._capacity(engine.pool),
+                    **self._counters[name],
+                }
+                for name, engine in self.engines.items()
+            }
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import and_, func
+
+from app.models.category import Category
+from app.models.user_category_preference import UserCategoryPreference
+from app.common.alias import AliasTable
+from app.common.db import db
+
+class CategorySampler:
+    """
+    Picks a category for a user according to their learnt weights.
+
+    Alias tables are cached per user and rebuilt only when the user's
+    `category_weights_version` changes or the entry is older than the TTL,
+    which also bounds how long categories added by other workers stay unseen.
+    """
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.base_weight = app.config["CATEGORY_BASE_WEIGHT"]
+        self.cache_size = app.config["CATEGORY_WEIGHTS_CACHE_SIZE"]
+        self.ttl = app.config["CATEGORY_WEIGHTS_CACHE_TTL"]
+
+    def choose(self, user):
+        """
+        Return a weighted random category id, or None if there are no categories.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(user.id)
+            if entry and entry[0] == user.category_weights_version and entry[1] > now:
+                self._cache.move_to_end(user.id)
+                return entry[2].sample()
+
+        table = self._build(user.id)
+        if table is None:
+            return None
+
+        with self._lock:
+            self._cache[user.id] = (user.category_weights_version, now + self.ttl, table)
+            self._cache.move_to_end(user.id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return table.sample()
+
+    def _build(self, user_id):
+        rows = (
+            db.session.query(Category.id, func.coalesce(UserCategoryPreference.weight, 0))
+            .outerjoin(
+                UserCategoryPreference,
+                and_(
+                    UserCategoryPreference.category_id == Category.id,
+                    UserCategoryPreference.user_id == user_id,
+                ),
+            )
+            .all()
+        )
+        if not rows:
+            return None
+        return AliasTable(
+            [category_id for category_id, _ in rows],
+            [self.base_weight + weight for _, weight in rows],
+        )
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+category_sampler = CategorySampler()
@@ -0,0 +1,77 @@
+import json
+
+from app.common.jobs import job_queue
+
+# Queue keys embed the catalogue version so invalidation is a single INCR
+POP_SCRIPT = """
+local version = redis.call("GET", KEYS[1]) or "0"
+local key = ARGV[1] .. version .. ":" .. ARGV[2]
+return {redis.call("LPOP", key), redis.call("LLEN", key)}
+"""
+
+class TaskPrefetcher:
+    """
+    Per-user queues of unseen tasks kept in Redis lists, so that assigning
+    an existing task is a single LPOP plus an insert.
+    """
+    VERSION_KEY = "prefetch:version"
+    QUEUE_PREFIX = "prefetch:tasks:v"
+    LOCK_PREFIX = "prefetch:filling:"
+
+    def __init__(self):
+        self.enabled = False
+        self.client = None
+
+    def init_app(self, app):
+        self.enabled = app.config["TASK_PREFETCH_ENABLED"]
+        self.size = app.config["TASK_PREFETCH_SIZE"]
+        self.threshold = app.config["TASK_PREFETCH_THRESHOLD"]
+        self.ttl = app.config["TASK_PREFETCH_TTL"]
+        if self.enabled:
+            import redis
+
+            self.client = redis.Redis.from_url(app.config["TASK_PREFETCH_REDIS_URI"], decode_responses=True)
+            self._pop = self.client.register_script(POP_SCRIPT)
+
+    def _suffix(self, telegram_id, category_name):
+        return f"{telegram_id}:{category_name or '*'}"
+
+    def version(self):
+        return int(self.client.get(self.VERSION_KEY) or 0)
+
+    def pop(self, telegram_id, category_name):
+        """
+        Take the next prefetched task for the user, refilling the queue when it runs low.
+        """
+        suffix = self._suffix(telegram_id, category_name)
+        entry, remaining = self._pop(keys=[self.VERSION_KEY], args=[self.QUEUE_PREFIX, suffix])
+        if remaining < self.threshold:
+            self.request_fill(telegram_id, category_name)
+        return json.loads(entry) if entry else None
+
+    def request_fill(self, telegram_id, category_name):
+        lock_key = self.LOCK_PREFIX + self._suffix(telegram_id, category_name)
+        if self.client.set(lock_key, 1, nx=True, ex=60):
+            job_queue.enqueue("tasks.prefetch", telegram_id=telegram_id, category_name=category_name)
+
+    def queued_ids(self, telegram_id, category_name, version):
+        key = f"{self.QUEUE_PREFIX}{version}:{self._suffix(telegram_id, category_name)}"
+        return [json.loads(entry)["id"] for entry in self.client.lrange(key, 0, -1)]
+
+    def push(self, telegram_id, category_name, version, entries):
+        key = f"{self.QUEUE_PREFIX}{version}:{self._suffix(telegram_id, category_name)}"
+        pipe = self.client.pipeline()
+        if entries:
+            pipe.rpush(key, *[json.dumps(entry) for entry in entries])
+            pipe.expire(key, self.ttl)
+        pipe.delete(self.LOCK_PREFIX + self._suffix(telegram_id, category_name))
+        pipe.execute()
+
+    def invalidate(self):
+        """
+        Drop every prefetched queue, e.g. after tasks or categories change.
+        """
+        if self.enabled:
+            self.client.incr(self.VERSION_KEY)
+
+prefetcher = TaskPrefetcher()
@@ -0,0 +1,222 @@
+import cProfile
+import glob
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from app.common.exceptions import NotFoundError, ValidationError
+
+MODES = {"cprofile": "pstats", "sample": "collapsed"}
+
+def collapse_stack(frame):
+    """
+    `root;caller;callee` line of a flamegraph for the stack ending at `frame`.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Capture:
+    def __init__(self, endpoint, requests, mode, view):
+        self.endpoint = endpoint
+        self.requests = requests
+        self.mode = mode
+        self.view = view
+        self.profiled = 0
+        self.started_at = time.time()
+        self.stats = None
+        self.stacks = Counter()
+        # cProfile allows one active profiler per process, requests running alongside are not profiled
+        self.lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.profiled >= self.requests
+
+    def to_dict(self):
+        return {
+            "endpoint": self.endpoint,
+            "mode": self.mode,
+            "requests": self.requests,
+            "profiled": self.profiled,
+            "started_at": self.started_at,
+        }
+
+
+class EndpointProfiler:
+    """
+    Profiles the next N requests of one endpoint, with cProfile or by
+    sampling the stack of the request thread every PROFILE_SAMPLE_INTERVAL_MS.
+    A sampler needs the GIL to run, so sampling sees CPU-bound code at most
+    every `sys.getswitchinterval()` (5 ms), it is meant for slow endpoints.
+
+    While a capture runs the endpoint's view function is wrapped, otherwise
+    the app runs unchanged. Results are written to PROFILE_DIR when the
+    capture completes, one file per worker, and downloads add up every file
+    of the endpoint: pstats for cProfile, collapsed stacks for flamegraph.pl
+    or speedscope for sampling.
+
+    PROFILE_ENDPOINT arms every worker at startup, the /debug/profile
+    routes only the worker that answers.
+    """
+    def __init__(self):
+        self.capture = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # The view functions must be registered, call after the blueprints
+        self.app = app
+        self.directory = app.config["PROFILE_DIR"]
+        self.sample_interval = app.config["PROFILE_SAMPLE_INTERVAL_MS"] / 1000
+        self.capture = None
+
+        if app.config["PROFILE_ENDPOINT"]:
+            self.start(app.config["PROFILE_ENDPOINT"], app.config["PROFILE_REQUESTS"], app.config["PROFILE_MODE"])
+
+    def start(self, endpoint, requests, mode):
+        if endpoint not in self.app.view_functions:
+            raise NotFoundError(f"Unknown endpoint: {endpoint}")
+        if mode not in MODES:
+            raise ValidationError(f"Unknown profiling mode: {mode}. Expected one of: {', '.join(MODES)}")
+        if requests < 1:
+            raise ValidationError("The number of requests must be at least 1.")
+
+        with self._lock:
+            self._restore()
+            capture = Capture(endpoint, requests, mode, self.app.view_functions[endpoint])
+            self.app.view_functions[endpoint] = self._wrap(capture)
+            self.capture = capture
+        return capture.to_dict()
+
+    def stop(self):
+        """
+        End the running capture early, keeping what it profiled so far.
+        """
+        with self._lock:
+            capture = self.capture
+            self._restore()
+        if capture is not None and capture.profiled:
+            self._save(capture)
+        return capture.to_dict() if capture else None
+
+    def status(self):
+        capture = self.capture
+        return {
+            "capture": capture.to_dict() if capture else None,
+            "stored": sorted(os.path.basename(path) for path in glob.glob(os.path.join(self.directory, "*.*.*"))),
+        }
+
+    def _restore(self):
+        if self.capture is not None:
+            self.app.view_functions[self.capture.endpoint] = self.capture.view
+            self.capture = None
+
+    def _wrap(self, capture):
+        view = capture.view
+        run = self._run_cprofile if capture.mode == "cprofile" else self._run_sampled
+
+        @wraps(view)
+        def profiled_view(*args, **kwargs):
+            if capture.done or not capture.lock.acquire(blocking=False):
+                return view(*args, **kwargs)
+            try:
+                return run(capture, view, args, kwargs)
+            finally:
+                capture.profiled += 1
+                capture.lock.release()
+                if capture.done:
+                    self._finish(capture)
+        return profiled_view
+
+    def _finish(self, capture):
+        with self._lock:
+            if self.capture is capture:
+                self._restore()
+        self._save(capture)
+
+    def _run_cprofile(self, capture, view, args, kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(view, *args, **kwargs)
+        finally:
+            if capture.stats is None:
+                capture.stats = pstats.Stats(profile)
+            else:
+                capture.stats.add(profile)
+
+    def _run_sampled(self, capture, view, args, kwargs):
+        thread_id = threading.get_ident()
+        finished = threading.Event()
+
+        def sample():
+            while not finished.wait(self.sample_interval):
+                frame = sys._current_frames().get(thread_id)
+                # The sampler may only get the GIL once the view has returned and waits for it
+                if frame is not None and not finished.is_set():
+                    capture.stacks[collapse_stack(frame)] += 1
+
+        sampler = threading.Thread(target=sample, name="profile-sampler", daemon=True)
+        sampler.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            finished.set()
+            sampler.join()
+
+    def _path(self, endpoint, extension):
+        return os.path.join(self.directory, f"{endpoint}.{os.getpid()}.{extension}")
+
+    def _save(self, capture):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(capture.endpoint, MODES[capture.mode])
+        if capture.mode == "cprofile":
+            capture.stats.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in capture.stacks.items())
+        self.app.logger.info(f"Profile of {capture.profiled} {capture.endpoint} requests written to {path}")
+
+    def load(self, endpoint, output_format):
+        """
+        Stored results of `endpoint` added up over the workers, as pstats
+        (marshalled, for `pstats.Stats` or snakeviz), text or collapsed stacks.
+        """
+        extension = "collapsed" if output_format == "collapsed" else "pstats"
+        paths = glob.glob(os.path.join(self.directory, f"{glob.escape(endpoint)}.*.{extension}"))
+        if not paths:
+            raise NotFoundError(f"No stored {extension} profile for {endpoint}")
+
+        if output_format == "collapsed":
+            stacks = Counter()
+            for path in paths:
+                with open(path) as f:
+                    for line in f:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        stacks[stack] += int(count)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+        stats = pstats.Stats(*paths)
+        if output_format == "pstats":
+            return marshal.dumps(stats.stats)
+
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats("cumulative").print_stats(50)
+        return output.getvalue()
+
+    def clear(self, endpoint=None):
+        pattern = f"{glob.escape(endpoint)}.*.*" if endpoint else "*.*.*"
+        for path in glob.glob(os.path.join(self.directory, pattern)):
+            os.remove(path)
+
+endpoint_profiler = EndpointProfiler()
@@ -0,0 +1,291 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import DDL, column, event, func, literal_column, table, text
+
+from app.models.task import Task, search_vector
+from app.models.category import Category
+from app.common.db import db
+
+TOKEN = re.compile(r"\w+")
+
+# Kept in sync with `tasks` by triggers, so every write path updates it
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts
+    USING fts5(description, content='tasks', content_rowid='id', tokenize='porter unicode61')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO tasks_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+def tokenize(value):
+    return TOKEN.findall(value.lower())
+
+def sqlite_has_fts5(connection):
+    return bool(connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+def _create_sqlite_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite" and sqlite_has_fts5(connection):
+        for statement in SQLITE_FTS_DDL:
+            connection.execute(DDL(statement))
+
+event.listen(Task.__table__, "after_create", _create_sqlite_fts)
+
+
+class PostgresTaskSearch:
+    """
+    `to_tsvector` over the description, served by the GIN index of the Task model.
+    """
+    name = "postgres"
+
+    def search(self, query, category_name, limit, offset):
+        vector = search_vector(Task.description)
+        tsquery = func.websearch_to_tsquery(text("'english'"), query)
+        tasks_query = (
+            db.session.query(Task.id, Task.description, Category.name)
+            .join(Category, Task.category_id == Category.id)
+            .filter(vector.op("@@")(tsquery))
+        )
+        if category_name:
+            tasks_query = tasks_query.filter(Category.name == category_name)
+        return (
+            tasks_query.order_by(func.ts_rank(vector, tsquery).desc(), Task.id)
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+
+    def rebuild(self):
+        index = next(index for index in Task.__table__.indexes if index.name == "ix_tasks_description_search")
+        index.create(db.session.connection(), checkfirst=True)
+
+    def index(self, task_id, description, category_name):
+        pass
+
+    def remove(self, task_id):
+        pass
+
+    def invalidate(self):
+        pass
+
+
+class SqliteTaskSearch:
+    """
+    FTS5 external-content table over `tasks`, ranked by bm25.
+    """
+    name = "sqlite"
+    fts = table("tasks_fts", column("rowid"))
+
+    def search(self, query, category_name, limit, offset):
+        # Every word is quoted, FTS5 operators in user input are matched literally
+        match = " ".join('"' + token + '"' for token in tokenize(query))
+        if not match:
+            return []
+
+        fts_table = literal_column("tasks_fts")
+        tasks_query = (
+            db.session.query(Task.id, Task.description, Category.name)
+            .select_from(self.fts)
+            .join(Task, Task.id == self.fts.c.rowid)
+            .join(Category, Task.category_id == Category.id)
+            .filter(fts_table.op("MATCH")(match))
+        )
+        if category_name:
+            tasks_query = tasks_query.filter(Category.name == category_name)
+        return (
+            tasks_query.order_by(func.bm25(fts_table), Task.id)
+            .limit(limit)
+            .offset(offset)
+            .all()
+        )
+
+    def rebuild(self):
+        connection = db.session.connection()
+        for statement in SQLITE_FTS_DDL:
+            connection.execute(DDL(statement))
+        connection.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+    def index(self, task_id, description, category_name):
+        pass
+
+    def remove(self, task_id):
+        pass
+
+    def invalidate(self):
+        pass
+
+
+class MemoryTaskSearch:
+    """
+    Inverted index held by the process, ranked by TF-IDF.
+
+    Writes of this process are applied immediately, writes of other workers
+    show up once the index is older than SEARCH_INDEX_TTL and gets reloaded.
+    """
+    name = "memory"
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, category_name, limit, offset):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        self._ensure_loaded()
+        with self._lock:
+            postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+            if not postings[0]:
+                return []
+
+            count = len(self._documents)
+            scores = {}
+            for task_id in postings[0]:
+                if all(task_id in posting for posting in postings[1:]):
+                    if category_name and self._documents[task_id][1] != category_name:
+                        continue
+                    scores[task_id] = sum(
+                        posting[task_id] * math.log(1 + count / len(posting))
+                        for posting in postings
+                    )
+
+            ranked = sorted(scores, key=lambda task_id: (-scores[task_id], task_id))
+            return [
+                (task_id, *self._documents[task_id])
+                for task_id in ranked[offset:offset + limit]
+            ]
+
+    def _ensure_loaded(self):
+        if self._expires_at > time.monotonic():
+            return
+
+        rows = (
+            db.session.query(Task.id, Task.description, Category.name)
+            .join(Category, Task.category_id == Category.id)
+            .all()
+        )
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            for row in rows:
+                self._add(*row)
+            self._expires_at = time.monotonic() + self.ttl
+
+    def _add(self, task_id, description, category_name):
+        self._documents[task_id] = (description, category_name)
+        for term, frequency in Counter(tokenize(description)).items():
+            self._postings[term][task_id] = frequency
+
+    def _discard(self, task_id):
+        document = self._documents.pop(task_id, None)
+        if document:
+            for term in set(tokenize(document[0])):
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(task_id, None)
+                    if not posting:
+                        del self._postings[term]
+
+    def rebuild(self):
+        self.invalidate()
+        self._ensure_loaded()
+
+    def index(self, task_id, description, category_name):
+        with self._lock:
+            self._discard(task_id)
+            self._add(task_id, description, category_name)
+
+    def remove(self, task_id):
+        with self._lock:
+            self._discard(task_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0
+
+
+class TaskSearch:
+    """
+    Full-text search over task descriptions.
+
+    SEARCH_BACKEND=auto picks Postgres full-text search or SQLite FTS5 from the
+    database dialect and falls back to the in-process index otherwise.
+    """
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.backend_name = app.config["SEARCH_BACKEND"]
+        self.ttl = app.config["SEARCH_INDEX_TTL"]
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._create_backend()
+        return self._backend
+
+    def _create_backend(self):
+        name = self.backend_name
+        if name == "auto":
+            dialect = db.engine.dialect.name
+            if dialect == "postgresql":
+                name = "postgres"
+            elif dialect == "sqlite":
+                with db.engine.connect() as connection:
+                    name = "sqlite" if sqlite_has_fts5(connection) else "memory"
+            else:
+                name = "memory"
+
+        if name == "postgres":
+            return PostgresTaskSearch()
+        if name == "sqlite":
+            return SqliteTaskSearch()
+        if name == "memory":
+            return MemoryTaskSearch(self.ttl)
+        raise ValueError(f"Unknown SEARCH_BACKEND: {name}")
+
+    def search(self, query, category_name=None, limit=20, offset=0):
+        """
+        Return (id, description, category) rows, best match first.
+        """
+        return self.backend.search(query, category_name, limit, offset)
+
+    def rebuild(self):
+        self.backend.rebuild()
+
+    def index(self, task_id, description, category_name):
+        self.backend.index(task_id, description, category_name)
+
+    def remove(self, task_id):
+        self.backend.remove(task_id)
+
+    def invalidate(self):
+        self.backend.invalidate()
+
+task_search = TaskSearch()
@@ -0,0 +1,13 @@
+import json
+
+def sse_event(event, data):
+    """
+    Format one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def ndjson_line(data):
+    """
+    Format one line of newline-delimited JSON.
+    """
+    return json.dumps(data) + "\n"
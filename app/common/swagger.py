@@ -1,13 +1,16 @@
-from flasgger import Swagger
+import json
 import os
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
 
 def configure_swagger(app):
     """
     Configure Swagger documentation for the app.
+
+    The spec is built from the route docstrings on the first /swagger.json
+    request, unless SWAGGER_SPEC_FILE points to a spec exported at build time
+    with `flask swagger export`.
     """
+    from flasgger import Swagger
+
     swagger_config = {
         "headers": [],
         "specs": [
@@ -30,8 +33,15 @@ def configure_swagger(app):
             "description": "API documentation for Random Adventure Generator",
             "version": "1.0.0",
         },
-        "host": os.getenv("HOST"),
+        "host": app.config["SWAGGER_HOST"],
         "basePath": "/",
     }
 
+    spec_file = app.config["SWAGGER_SPEC_FILE"]
+    if spec_file and os.path.exists(spec_file):
+        with open(spec_file) as f:
+            swagger_template = json.load(f)
+        # The paths are already in the exported spec, skip parsing the docstrings
+        swagger_config["specs"][0]["rule_filter"] = lambda rule: False
+
     Swagger(app, config=swagger_config, template=swagger_template)
@@ -0,0 +1,132 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.common.db import db
+
+def coalesce_with(batch_operation):
+    """
+    Declare that queued calls of the decorated operation can be run together
+    as `batch_operation(list_of_args)`, which returns one result per call.
+    """
+    def decorator(operation):
+        operation.batch = batch_operation
+        return operation
+    return decorator
+
+
+class WriteQueue:
+    """
+    Single writer thread per process that runs queued write operations and
+    commits them together (group commit). Calls of an operation declared with
+    `coalesce_with` are merged into multi-row statements.
+
+    Crash safety: callers block on their future until the batch is committed,
+    so nothing is acknowledged before it is durable. A crash loses only the
+    queued writes, and their requests never got a response.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.commits = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["WRITE_QUEUE_ENABLED"]
+        self.max_batch = app.config["WRITE_QUEUE_MAX_BATCH"]
+        self.max_delay = app.config["WRITE_QUEUE_MAX_DELAY_MS"] / 1000
+
+    def submit(self, operation, *args):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((operation, args, future))
+        return future
+
+    def _ensure_started(self):
+        # Started lazily and once per process, gunicorn forks after the app is loaded
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="write-queue", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Writes queued while the previous batch was committing join this one,
+            # WRITE_QUEUE_MAX_DELAY_MS additionally waits for more of them
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        batch.append(self._queue.get(timeout=timeout))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        calls = {}
+        for item in batch:
+            calls.setdefault(item[0], []).append(item)
+
+        with self.app.app_context():
+            try:
+                results = []
+                for operation, items in calls.items():
+                    batch_operation = getattr(operation, "batch", None)
+                    if batch_operation and len(items) > 1:
+                        values = batch_operation([args for _, args, _ in items])
+                    else:
+                        values = [operation(*args) for _, args, _ in items]
+                    results.extend(zip((future for _, _, future in items), values))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # One failing operation must not fail the others, retry them one by one
+                for item in batch:
+                    self._flush_one(*item)
+                return
+
+        self.commits += 1
+        self.operations += len(batch)
+        for future, result in results:
+            future.set_result(result)
+
+    def _flush_one(self, operation, args, future):
+        try:
+            result = operation(*args)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            future.set_exception(e)
+        else:
+            self.commits += 1
+            self.operations += 1
+            future.set_result(result)
+
+write_queue = WriteQueue()
+
+def run_write(operation, *args):
+    """
+    Run a write operation and commit it, through the write queue when enabled.
+    """
+    if write_queue.enabled:
+        # Give the connection back to the pool first, the writer needs one too
+        db.session.commit()
+        return write_queue.submit(operation, *args).result()
+
+    result = operation(*args)
+    db.session.commit()
+    return result
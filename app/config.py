@@ -1,11 +1,152 @@
 import os
 from dotenv import load_dotenv
 
+# The only place .env is loaded, everything else reads the app config
 load_dotenv(override=True)
 
 class Config:
       SQLALCHEMY_TRACK_MODIFICATIONS = True
 
+      # Read-only controllers are served by this replica when set
+      REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+      SQLALCHEMY_BINDS = {"replica": REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+
+      # Connection pool of each engine, SQLAlchemy's defaults for the options left unset
+      SQLALCHEMY_ENGINE_OPTIONS = {
+            name: cast(os.getenv(variable))
+            for name, variable, cast in [
+                  ("pool_size", "DB_POOL_SIZE", int),
+                  ("max_overflow", "DB_MAX_OVERFLOW", int),
+                  ("pool_timeout", "DB_POOL_TIMEOUT", float),
+                  ("pool_recycle", "DB_POOL_RECYCLE", int),
+            ]
+            if os.getenv(variable)
+      }
+      # Check connections before use, replaces the ones the database dropped
+      SQLALCHEMY_ENGINE_OPTIONS["pool_pre_ping"] = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+      # Minimum seconds between two "pool exhausted" warnings per engine
+      POOL_EXHAUSTED_LOG_INTERVAL = int(os.getenv("POOL_EXHAUSTED_LOG_INTERVAL", 60))
+
+      OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+      # Defaults to the OpenAI API, point it at benchmarks/openai_stub.py to run without it
+      OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+      RATELIMIT_STORAGE_URI = os.getenv("REDIS_RATE_LIMITER_URI")
+      # leased-fixed-window takes hits from storage in leases of up to RATELIMIT_LEASE_MAX,
+      # sharded+redis://host1:6379/0,host2:6379/0 spreads the counters over several Redis nodes
+      RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "fixed-window")
+      RATELIMIT_LEASE_FRACTION = float(os.getenv("RATELIMIT_LEASE_FRACTION", 0.1))
+      RATELIMIT_LEASE_MAX = int(os.getenv("RATELIMIT_LEASE_MAX", 10))
+      # Limit applied to every route, e.g. "1000 per minute"
+      RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT")
+      # Comma-separated keys of bot clients (X-Bot-Key), their responses skip the browser security headers
+      BOT_API_KEYS = [key for key in os.getenv("BOT_API_KEYS", "").split(",") if key]
+
+      # Applied to SQLite connections, cache_size < 0 is in KiB
+      SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+      SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+      SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -65536))
+      # Enforce foreign keys, ON DELETE CASCADE removes the assignments of a deleted task
+      SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "true").lower() == "true"
+
+      # Single writer thread per process batching assignment/completion commits
+      WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() == "true"
+      WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", 100))
+      WRITE_QUEUE_MAX_DELAY_MS = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", 0))
+
+      # Sent in X-Admin-Key to reach the /debug and /health routes and /tasks/assign-bulk, they are disabled without it
+      ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+      # Profile the next PROFILE_REQUESTS requests of PROFILE_ENDPOINT in every worker => cprofile | sample
+      PROFILE_ENDPOINT = os.getenv("PROFILE_ENDPOINT")
+      PROFILE_REQUESTS = int(os.getenv("PROFILE_REQUESTS", 100))
+      PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+      PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
+      PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+      # Logs => json | text, written to stdout by a background thread unless LOG_QUEUE_ENABLED=false
+      LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+      LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+      LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "true").lower() == "true"
+      # One record per request, successful requests are sampled (0.0 - 1.0), errors always logged
+      ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "true").lower() == "true"
+      ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+      LOG_SLOW_QUERY_MS = float(os.getenv("LOG_SLOW_QUERY_MS", 100))
+
+      SWAGGER_HOST = os.getenv("HOST")
+      # Spec exported at build time with `flask swagger export`
+      SWAGGER_SPEC_FILE = os.getenv("SWAGGER_SPEC_FILE")
+
+      # Background jobs => thread (in-process) or redis (run `python -m app.worker`)
+      JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "thread")
+      JOB_QUEUE_REDIS_URI = os.getenv("JOB_QUEUE_REDIS_URI")
+      JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 4))
+      JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", 3))
+      # Seconds before the first retry of a failed job, doubled for every further one up to the max
+      JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", 1.0))
+      JOB_RETRY_BACKOFF_MAX = float(os.getenv("JOB_RETRY_BACKOFF_MAX", 60.0))
+      JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 86400))
+
+      # Per-user queues of unseen tasks served by /tasks/get
+      TASK_PREFETCH_ENABLED = os.getenv("TASK_PREFETCH_ENABLED", "false").lower() == "true"
+      TASK_PREFETCH_REDIS_URI = os.getenv("TASK_PREFETCH_REDIS_URI")
+      TASK_PREFETCH_SIZE = int(os.getenv("TASK_PREFETCH_SIZE", 10))
+      TASK_PREFETCH_THRESHOLD = int(os.getenv("TASK_PREFETCH_THRESHOLD", 3))
+      TASK_PREFETCH_TTL = int(os.getenv("TASK_PREFETCH_TTL", 86400))
+
+      # Weighted random category selection, weight = base + completed tasks in the category
+      CATEGORY_BASE_WEIGHT = float(os.getenv("CATEGORY_BASE_WEIGHT", 1.0))
+      CATEGORY_WEIGHTS_CACHE_SIZE = int(os.getenv("CATEGORY_WEIGHTS_CACHE_SIZE", 10000))
+      CATEGORY_WEIGHTS_CACHE_TTL = int(os.getenv("CATEGORY_WEIGHTS_CACHE_TTL", 300))
+
+      # ETag / Last-Modified on read endpoints, without Redis only correct with a single worker
+      HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "false").lower() == "true"
+      HTTP_CACHE_REDIS_URI = os.getenv("HTTP_CACHE_REDIS_URI")
+      # JSON object of endpoint => Cache-Control, e.g. {"categories.get_all_categories_route": "public, max-age=60"}
+      HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL")
+
+      # Completed user tasks older than this are moved to user_tasks_archive by `flask user-tasks archive`
+      USER_TASKS_ARCHIVE_AFTER_DAYS = int(os.getenv("USER_TASKS_ARCHIVE_AFTER_DAYS", 90))
+
+      # Users assigned per transaction by /tasks/assign-bulk
+      BULK_ASSIGN_CHUNK_SIZE = int(os.getenv("BULK_ASSIGN_CHUNK_SIZE", 1000))
+
+      # Rows deleted per transaction by the `categories.purge` job of a deleted category
+      CATEGORY_PURGE_BATCH_SIZE = int(os.getenv("CATEGORY_PURGE_BATCH_SIZE", 1000))
+
+      # Cache of OpenAI generations => none | redis | disk
+      GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "none")
+      GENERATION_CACHE_REDIS_URI = os.getenv("GENERATION_CACHE_REDIS_URI")
+      GENERATION_CACHE_PATH = os.getenv("GENERATION_CACHE_PATH", "generation_cache.db")
+      # Distinct generations served per category and window before the model is called again
+      GENERATION_CACHE_PER_KEY = int(os.getenv("GENERATION_CACHE_PER_KEY", 5))
+      GENERATION_CACHE_WINDOW = int(os.getenv("GENERATION_CACHE_WINDOW", 3600))
+      GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", 10000))
+
+      # Global OpenAI budget shared by every worker through Redis (per process without it)
+      GENERATION_BUDGET_ENABLED = os.getenv("GENERATION_BUDGET_ENABLED", "false").lower() == "true"
+      GENERATION_BUDGET_REDIS_URI = os.getenv("GENERATION_BUDGET_REDIS_URI")
+      GENERATION_TOKENS_PER_MINUTE = int(os.getenv("GENERATION_TOKENS_PER_MINUTE", 100000))
+      GENERATION_MAX_CONCURRENCY = int(os.getenv("GENERATION_MAX_CONCURRENCY", 20))
+      # Reserved per call until OpenAI reports the usage, prompt + max_tokens
+      GENERATION_ESTIMATED_TOKENS = int(os.getenv("GENERATION_ESTIMATED_TOKENS", 150))
+      # Seconds a call waits for room before falling back to an existing task
+      GENERATION_BUDGET_WAIT = float(os.getenv("GENERATION_BUDGET_WAIT", 2))
+      GENERATION_LEASE_TTL = int(os.getenv("GENERATION_LEASE_TTL", 60))
+
+      # /tasks/search => auto (by database dialect) | postgres | sqlite | memory
+      SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+      # Reload interval of the in-process (memory) index
+      SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", 300))
+
+      # Tasks held in memory by every worker for /tasks/<id> and /tasks/get, polled for changes
+      TASK_CATALOGUE_ENABLED = os.getenv("TASK_CATALOGUE_ENABLED", "false").lower() == "true"
+      TASK_CATALOGUE_POLL_INTERVAL = float(os.getenv("TASK_CATALOGUE_POLL_INTERVAL", 30))
+      # Seconds of `updated_at` fetched again on every poll, for transactions that committed late
+      TASK_CATALOGUE_POLL_OVERLAP = int(os.getenv("TASK_CATALOGUE_POLL_OVERLAP", 60))
+      # Changes kept on top of the loaded catalogue before it is reloaded
+      TASK_CATALOGUE_MAX_CHANGES = int(os.getenv("TASK_CATALOGUE_MAX_CHANGES", 10000))
+      # File mapped by every worker instead of a copy each, rebuilt with `flask catalogue rebuild`
+      TASK_CATALOGUE_PATH = os.getenv("TASK_CATALOGUE_PATH")
+
 class DevelopmentConfig(Config):
       DEVELOPMENT = True
       DEBUG = True
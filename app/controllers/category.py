@@ -1,90 +1,154 @@
-from sqlalchemy.exc import SQLAlchemyError
+from flask import current_app
+from sqlalchemy import func
 
 from app.models.category import Category
-from app.common.db import db
-from app.common.exceptions import DatabaseError, NotFoundError
+from app.models.task import Task
+from app.models.user_task import UserTask
+from app.models.user_task_archive import UserTaskArchive
+from app.models.user_category_preference import UserCategoryPreference
+from app.common.db import db, read_only
+from app.common.jobs import job_queue, register_job
+from app.common.prefetch import prefetcher
+from app.common.preferences import category_sampler
+from app.common.search import task_search
+from app.common.catalogue import task_catalogue
+from app.common.errors import handle_errors
+from app.common.exceptions import NotFoundError
 
+@handle_errors
 def create_category(data):
-    try:
-        name = data.get("name")
-        category = Category(
-            name = name,
-        )
-        db.session.add(category)
-        db.session.commit()
-        result = {
-            "id": category.id,
-            "name": category.name,
-        }
-        return result
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    name = data.get("name")
+    category = Category(
+        name = name,
+    )
+    db.session.add(category)
+    db.session.commit()
+    category_sampler.invalidate()
+    result = {
+        "id": category.id,
+        "name": category.name,
+    }
+    return result
 
+@read_only
+@handle_errors
 def get_all_categories():
-    try:
-        categories = Category.query.all()
-        result = [{"id": category.id, "name": category.name} for category in categories]
-        return result
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    categories = Category.query.all()
+    result = [{"id": category.id, "name": category.name} for category in categories]
+    return result
 
+@read_only
+@handle_errors
 def get_category_by_id(id):
-    try:
-        category = Category.query.get(id)
-        if not category:
-            raise NotFoundError("Category not found.")
-        
-        result = {
-            "id": category.id,
-            "name": category.name
-        }
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    category = Category.query.get(id)
+    if not category:
+        raise NotFoundError("Category not found.")
+    
+    result = {
+        "id": category.id,
+        "name": category.name
+    }
+    return result
 
+@handle_errors
 def update_category(id, data):
-    try:
-        category = Category.query.get(id)
-        if not category:
-            raise NotFoundError("Category not found.")
-        
-        if "name" in data:
-            category.name = data.get("name")
+    category = Category.query.get(id)
+    if not category:
+        raise NotFoundError("Category not found.")
+    
+    if "name" in data:
+        category.name = data.get("name")
 
-        db.session.commit()
-        result = {
-            "id": category.id,
-            "name": category.name,
-        }        
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    db.session.commit()
+    prefetcher.invalidate()
+    task_search.invalidate()
+    task_catalogue.invalidate()
+    result = {
+        "id": category.id,
+        "name": category.name,
+    }        
+    return result
 
+@handle_errors
 def delete_category(id):
-    try:
-        category = Category.query.get(id)
-        if not category:
-            raise NotFoundError("Category not found.")
-        
-        db.session.delete(category)
+    category = Category.query.get(id)
+    if not category:
+        raise NotFoundError("Category not found.")
+    
+    # Hidden from now on, the purge job removes the rows in batches
+    category.deleted_at = func.now()
+    db.session.commit()
+    prefetcher.invalidate()
+    task_search.invalidate()
+    task_catalogue.invalidate()
+    category_sampler.invalidate()
+    job = job_queue.enqueue("categories.purge", category_id=id)
+    result = {
+        "message": "Category deleted successfully",
+        "job_id": job["id"],
+        "status": job["status"],
+    }
+    return result
+
+def delete_in_batches(model, criteria, batch_size):
+    """
+    Delete the rows of `model` matching `criteria`, committing every
+    `batch_size` rows. Yields the number of rows of each batch.
+    """
+    while True:
+        ids = [id for id, in db.session.query(model.id).filter(*criteria).limit(batch_size)]
+        if not ids:
+            return
+        db.session.query(model).filter(model.id.in_(ids), *criteria).delete(synchronize_session=False)
         db.session.commit()
-        result = {"message": "Category deleted successfully"}
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
\ No newline at end of file
+        yield len(ids)
+
+@register_job("categories.purge")
+def purge_category(category_id):
+    """
+    Remove a deleted category with its tasks, their assignments (archived
+    ones included) and the users' preferences for it, CATEGORY_PURGE_BATCH_SIZE
+    rows per transaction. A retried purge carries on where the previous attempt
+    stopped. The rows deleted so far are reported as the job's progress.
+    """
+    batch_size = current_app.config["CATEGORY_PURGE_BATCH_SIZE"]
+    category = Category.query.execution_options(include_deleted=True).get(category_id)
+    if not category or category.deleted_at is None:
+        raise NotFoundError("Deleted category not found.")
+
+    tasks_query = db.session.query(Task.id).filter(Task.category_id == category_id)
+    deleted = {
+        "tasks_total": tasks_query.count(),
+        "tasks": 0,
+        "user_tasks": 0,
+        "user_tasks_archive": 0,
+        "user_category_preferences": 0,
+    }
+    job_queue.report_progress(dict(deleted))
+
+    while True:
+        task_ids = [task_id for task_id, in tasks_query.order_by(Task.id).limit(batch_size)]
+        if not task_ids:
+            break
+        # Assignments first, a popular task can have more of them than a batch
+        for model in (UserTask, UserTaskArchive):
+            for count in delete_in_batches(model, [model.task_id.in_(task_ids)], batch_size):
+                deleted[model.__tablename__] += count
+                job_queue.report_progress(dict(deleted))
+        Task.query.filter(Task.id.in_(task_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted["tasks"] += len(task_ids)
+        job_queue.report_progress(dict(deleted))
+
+    criteria = [UserCategoryPreference.category_id == category_id]
+    for count in delete_in_batches(UserCategoryPreference, criteria, batch_size):
+        deleted["user_category_preferences"] += count
+        job_queue.report_progress(dict(deleted))
+
+    Category.query.filter(Category.id == category_id).delete(synchronize_session=False)
+    db.session.commit()
+    prefetcher.invalidate()
+    task_search.invalidate()
+    task_catalogue.invalidate()
+    category_sampler.invalidate()
+    return deleted
@@ -0,0 +1,20 @@
+from app.common.jobs import job_queue
+from app.common.errors import handle_errors
+from app.common.exceptions import NotFoundError
+
+@handle_errors
+def get_job_by_id(id):
+    job = job_queue.get(id)
+    if not job:
+        raise NotFoundError("Job not found.")
+
+    result = {
+        "id": job["id"],
+        "name": job["name"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "progress": job.get("progress"),
+        "error": job["error"],
+    }
+    return result
@@ -1,16 +1,37 @@
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload
-from sqlalchemy import func
-from openai import OpenAIError
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy import func, select, tuple_, union_all
+import random
+from collections import Counter, defaultdict
 from datetime import datetime
 
 from app.models.task import Task
 from app.models.category import Category
 from app.models.user import User
 from app.models.user_task import UserTask
-from app.common.db import db
+from app.models.user_task_archive import UserTaskArchive
+from app.models.user_category_preference import UserCategoryPreference
+from app.common.db import db, insert, read_only
 from app.common.openai import openai_client
-from app.common.exceptions import DatabaseError, NotFoundError, AIGenerationError
+from app.common.budget import generation_budget
+from app.common.log import request_logger
+from app.common.generation_cache import generation_cache
+from app.common.streaming import ndjson_line, sse_event
+from app.common.jobs import job_queue, register_job
+from app.common.prefetch import prefetcher
+from app.common.preferences import category_sampler
+from app.common.search import task_search
+from app.common.catalogue import task_catalogue
+from app.common.writer import coalesce_with, run_write
+from app.common.errors import handle_errors
+from app.common.exceptions import (
+    CustomAPIException,
+    DatabaseError,
+    NotFoundError,
+    AIGenerationError,
+    GenerationBudgetExceededError,
+)
 
 CONTENT = """You are a task generator. Generate a random, short task that is 10-15 words long.
 Your tasks should be clear, concise, and meaningful.
@@ -20,236 +41,648 @@ Example: 'Write a letter to your future self',
 'Take a photo of something blue and share it'.
 """
 
+@handle_errors
 def create_task(data):
-    try:
-        description = data.get("description")
-        category_name = data.get("category_name")
+    description = data.get("description")
+    category_name = data.get("category_name")
 
-        category = Category.query.filter_by(name=category_name).first()
-        if not category:
-            raise NotFoundError("Category not found.")
+    category = Category.query.filter_by(name=category_name).first()
+    if not category:
+        raise NotFoundError("Category not found.")
 
-        task = Task(
-            description = description,
-            category_id = category.id,
-        )
-        db.session.add(task)
-        db.session.commit()
+    task = Task(
+        description = description,
+        category_id = category.id,
+    )
+    db.session.add(task)
+    db.session.commit()
+    task_search.index(task.id, task.description, category_name)
+    task_catalogue.index(task.id, task.category_id, task.description)
+
+    result = {
+        "id": task.id,
+        "description": task.description,
+        "category": category_name,
+    }
+    return result
 
-        result = {
+@read_only
+@handle_errors
+def get_all_tasks():
+    tasks = Task.query.join(Task.category).options(contains_eager(Task.category)).all()
+    result = [
+        {
             "id": task.id,
             "description": task.description,
-            "category": category_name,
+            "category": task.category.name,
         }
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+        for task in tasks
+    ]
 
-def get_all_tasks():
-    try:
-        tasks = Task.query.options(joinedload(Task.category)).all()
-        result = [
-            {
-                "id": task.id,
-                "description": task.description,
-                "category": task.category.name,
-            }
-            for task in tasks
-        ]
+    return result
 
+@read_only
+@handle_errors
+def get_task_by_id(id):
+    result = task_catalogue.get(id)
+    if result:
         return result
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
 
-def get_task_by_id(id):
-    try:
-        task = Task.query.options(joinedload(Task.category)).get(id)
-        if not task:
-            raise NotFoundError("Task not found.")
-        
-        result = {
-            "id": task.id,
-            "description": task.description,
-            "category": task.category.name,
+    task = Task.query.options(joinedload(Task.category)).get(id)
+    # Tasks of a deleted category have no category until its purge removes them
+    if not task or not task.category:
+        raise NotFoundError("Task not found.")
+    
+    result = {
+        "id": task.id,
+        "description": task.description,
+        "category": task.category.name,
+    }
+    return result
+
+@read_only
+@handle_errors
+def search_tasks(data):
+    page = data.get("page")
+    per_page = data.get("per_page")
+
+    tasks = task_search.search(
+        data.get("query"),
+        category_name=data.get("category_name"),
+        limit=per_page,
+        offset=(page - 1) * per_page,
+    )
+    result = [
+        {
+            "id": task_id,
+            "description": description,
+            "category": category_name,
         }
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+        for task_id, description, category_name in tasks
+    ]
 
+    return result
+
+@handle_errors
 def update_task(id, data):
-    try:
-        task = Task.query.get(id)
-        if not task:
-            raise NotFoundError("Task not found.")
-        
-        if "description" in data:
-            task.description = data.get("description")
-        if "category_name" in data:
-            category_name = data.get("category_name")
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                raise NotFoundError("Category not found")
-            task.category_id = category.id
-
-        db.session.commit()
-        result = {
-            "id": task.id,
-            "description": task.description,
-            "category": task.category.name,
-        }        
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    task = Task.query.get(id)
+    if not task or not task.category:
+        raise NotFoundError("Task not found.")
+    
+    if "description" in data:
+        task.description = data.get("description")
+    if "category_name" in data:
+        category_name = data.get("category_name")
+        category = Category.query.filter_by(name=category_name).first()
+        if not category:
+            raise NotFoundError("Category not found")
+        task.category_id = category.id
 
+    db.session.commit()
+    prefetcher.invalidate()
+    task_search.index(task.id, task.description, task.category.name)
+    task_catalogue.index(task.id, task.category_id, task.description)
+    result = {
+        "id": task.id,
+        "description": task.description,
+        "category": task.category.name,
+    }        
+    return result
+
+@handle_errors
 def delete_task(id):
-    try:
-        task = Task.query.get(id)
-        if not task:
-            raise NotFoundError("Task not found.")
-        
-        db.session.delete(task)
-        db.session.commit()
-        result = {"message": "Task deleted successfully"}
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    task = Task.query.get(id)
+    if not task or not task.category:
+        raise NotFoundError("Task not found.")
+    
+    db.session.delete(task)
+    db.session.commit()
+    prefetcher.invalidate()
+    task_search.remove(id)
+    task_catalogue.remove(id)
+    result = {"message": "Task deleted successfully"}
+    return result
+
+def insert_user_tasks(calls):
+    # One row per user/task: assigning the same task again keeps the existing
+    # row, in user_tasks or archived, which the unique constraint does not cover
+    seen = seen_tasks_query({user_id for _, user_id in calls})
+    assigned = set(db.session.execute(
+        select(seen.c.task_id, seen.c.user_id).where(seen.c.task_id.in_({task_id for task_id, _ in calls}))
+    ).tuples())
+    rows = [
+        {"user_id": user_id, "task_id": task_id, "status": "assigned"}
+        for task_id, user_id in dict.fromkeys(calls)
+        if (task_id, user_id) not in assigned
+    ]
+    if not rows:
+        return [None] * len(calls)
+    # executemany keeps the compiled statement cached, SQLAlchemy still sends multi-row VALUES
+    statement = insert(UserTask).on_conflict_do_nothing(index_elements=["user_id", "task_id"])
+    db.session.execute(statement, rows)
+    return [None] * len(calls)
+
+@coalesce_with(insert_user_tasks)
+def insert_user_task(task_id, user_id):
+    insert_user_tasks([(task_id, user_id)])
 
 def assign_task_to_user(task_id, user_id):
-    user_task = UserTask(
-        user_id = user_id,
-        task_id = task_id,
+    run_write(insert_user_task, task_id, user_id)
+
+def choose_category(user):
+    category_id = category_sampler.choose(user)
+    category = Category.query.get(category_id) if category_id is not None else None
+    if not category:
+        # Cached weights may still point to a category deleted by another worker
+        category_sampler.invalidate(user.id)
+        category = Category.query.order_by(func.random()).first()
+    return category
+
+def find_generated_task(description, category_name):
+    """
+    A cached generation was stored as a task when it was first generated, reuse that row.
+    """
+    task = (
+        db.session.query(Task.id, Task.description, Category.name)
+        .join(Category, Task.category_id == Category.id)
+        .filter(Task.description == description, Category.name == category_name)
+        .first()
     )
-    db.session.add(user_task)
-    db.session.commit()
+    if not task:
+        return None
 
-def generate_task(data):
-    try:
-        telegram_id = data.get("telegram_id")
-        category_name = data.get("category_name")
+    result = {
+        "id": task.id,
+        "description": task.description,
+        "category": task.name,
+    }
+    return result
 
-        user = User.query.filter_by(telegram_id=telegram_id).first()
-        if not user:
-            raise NotFoundError("User not found")          
+def find_generation_target(telegram_id, category_name):
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if not user:
+        raise NotFoundError("User not found")          
 
-        if not category_name:
-            category = Category.query.order_by(func.random()).first()
-            if not category:
-                raise NotFoundError("Category not found")
-            category_name = category.name
+    if not category_name:
+        category = choose_category(user)
+        if not category:
+            raise NotFoundError("Category not found")
+        category_name = category.name
 
-        messages = [
-            {
-                "role": "system",
-                "content":  CONTENT,
-            },
-            {
-                "role": "user",
-                "content": f"Generate a random task. Make it related to the category: {category_name}."
-            }
-        ]
-        chat_completion = openai_client.chat.completions.create(
-            messages = messages,
-            model = "gpt-4o-mini",
-            temperature=1,
-            max_tokens=50,
-        )   
-        description = chat_completion.choices[0].message.content.strip()
+    return user, category_name
+
+def generation_params(category_name):
+    messages = [
+        {
+            "role": "system",
+            "content":  CONTENT,
+        },
+        {
+            "role": "user",
+            "content": f"Generate a random task. Make it related to the category: {category_name}."
+        }
+    ]
+    params = {
+        "messages": messages,
+        "model": "gpt-4o-mini",
+        "temperature": 1,
+        "max_tokens": 50,
+    }
+    return params
 
+@register_job("tasks.generate")
+@handle_errors
+def generate_task(data):
+    telegram_id = data.get("telegram_id")
+    user, category_name = find_generation_target(telegram_id, data.get("category_name"))
+
+    try:
+        description, cached = generation_cache.create(**generation_params(category_name))
+    except GenerationBudgetExceededError as budget_error:
+        # Over the OpenAI budget, hand out an existing task of the category instead
+        try:
+            return assign_existing_task({
+                "telegram_id": telegram_id,
+                "category_name": category_name,
+            })
+        except NotFoundError:
+            raise budget_error
+
+    task = find_generated_task(description, category_name) if cached else None
+    if not task:
         task = create_task({
             "description": description,
             "category_name": category_name,
         })
 
-        assign_task_to_user(task["id"], user.id)
-     
-        return task
+    assign_task_to_user(task["id"], user.id)
+
+    return task
+
+@handle_errors
+def stream_generate_task(data):
+    """
+    Look up the user and category before anything is sent, so these errors keep
+    their status code, then return the Server-Sent Events of the generation.
+    """
+    telegram_id = data.get("telegram_id")
+    user, category_name = find_generation_target(telegram_id, data.get("category_name"))
+
+    return generate_task_events(telegram_id, user.id, category_name)
+
+def generate_task_events(telegram_id, user_id, category_name):
+    """
+    Send a `start` event, relay the completion as `token` events while OpenAI streams it, then store
+    and assign the task and send it as a `task` event. Errors raised after the
+    response has started are sent as an `error` event.
+    """
+    from openai import OpenAIError
+
+    params = generation_params(category_name)
+    # Sent before OpenAI is called, the client can show progress right away
+    yield sse_event("start", {"category": category_name})
+    try:
+        task = None
+        description = generation_cache.lookup(params)
+        if description is not None:
+            task = find_generated_task(description, category_name)
+            yield sse_event("token", {"content": description})
+        else:
+            parts = []
+            with generation_budget.reserve() as lease, request_logger.openai_call(model=params["model"], stream=True) as timing:
+                stream = openai_client.chat.completions.create(
+                    **params,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        lease.used(chunk.usage)
+                        timing["tokens"] = chunk.usage.total_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield sse_event("token", {"content": parts[-1]})
+            description = "".join(parts).strip()
+            generation_cache.add(params, description)
 
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
+        if not task:
+            task = create_task({
+                "description": description,
+                "category_name": category_name,
+            })
+
+        assign_task_to_user(task["id"], user_id)
+
+        yield sse_event("task", task)
+
+    except GenerationBudgetExceededError as e:
+        try:
+            task = assign_existing_task({
+                "telegram_id": telegram_id,
+                "category_name": category_name,
+            })
+            yield sse_event("task", task)
+        except NotFoundError:
+            yield sse_event("error", e.to_dict())
+    except CustomAPIException as e:
+        yield sse_event("error", e.to_dict())
     except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
+        db.session.rollback()
+        yield sse_event("error", DatabaseError(f"Database error: {str(e)}").to_dict())
     except OpenAIError as e:
-        raise AIGenerationError(f"Failed to generate task: {str(e)}")
+        yield sse_event("error", AIGenerationError(f"Failed to generate task: {str(e)}").to_dict())
     except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+        current_app.logger.error(f"Unexpected error: {str(e)}")
+        db.session.rollback()
+        yield sse_event("error", {"error": "An unexpected error occurred. Please try again later."})
+
+def enqueue_generate_task(data):
+    job = job_queue.enqueue("tasks.generate", data=data)
+    result = {
+        "job_id": job["id"],
+        "status": job["status"],
+    }
+    return result
 
+@handle_errors
 def assign_existing_task(data):
+    telegram_id = data.get("telegram_id")
+    category_name = data.get("category_name")
+
+    if prefetcher.enabled:
+        entry = prefetcher.pop(telegram_id, category_name)
+        if entry:
+            assign_task_to_user(entry["id"], entry["user_id"])
+            result = {
+                "id": entry["id"],
+                "description": entry["description"],
+                "category": entry["category"],
+            }
+            return result
+
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if not user:
+        raise NotFoundError("User not found")   
+
+    if not category_name:
+        category = choose_category(user)
+    else:
+        category = Category.query.filter_by(name=category_name).first()
+    
+    if not category:
+        raise NotFoundError("Category not found")
+
+    user_id, category_id, category_name = user.id, category.id, category.name
+    result = assign_catalogue_task(category_id, user_id)
+    if result:
+        return result
+
+    task = Task.query.filter_by(category_id=category_id).order_by(func.random()).first()
+    if not task:
+        raise NotFoundError("Task not found")
+    result = {
+        "id": task.id,
+        "description": task.description,
+        "category": category_name,
+    }
+
+    assign_task_to_user(result["id"], user_id)
+    return result
+
+def assign_catalogue_task(category_id, user_id):
+    """
+    Assign a random task of the category from the catalogue, None when it has
+    none. The catalogue may still hold a task that another worker deleted
+    since its last poll: that entry is dropped and None returned, so the
+    caller picks from the database instead.
+    """
+    result = task_catalogue.choose(category_id)
+    if not result:
+        return None
     try:
-        telegram_id = data.get("telegram_id")
-        category_name = data.get("category_name")
+        assign_task_to_user(result["id"], user_id)
+    except IntegrityError:
+        db.session.rollback()
+        # Also hides it in a mapped catalogue file until the file is rebuilt
+        task_catalogue.remove(result["id"])
+        return None
+    return result
+    
+@register_job("tasks.prefetch")
+def prefetch_tasks(telegram_id, category_name):
+    version = prefetcher.version()
+    entries = []
 
-        user = User.query.filter_by(telegram_id=telegram_id).first()
-        if not user:
-            raise NotFoundError("User not found")   
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if user:
+        seen_task_ids = select(seen_tasks_query([user.id]).c.task_id)
+        queued_task_ids = prefetcher.queued_ids(telegram_id, category_name, version)
 
-        if not category_name:
-            category = Category.query.order_by(func.random()).first()
+        tasks_query = (
+            db.session.query(Task.id, Task.description, Category.name)
+            .join(Category, Task.category_id == Category.id)
+            .filter(~Task.id.in_(seen_task_ids))
+        )
+        if queued_task_ids:
+            tasks_query = tasks_query.filter(Task.id.notin_(queued_task_ids))
+        if category_name:
+            tasks_query = tasks_query.filter(Category.name == category_name)
+            tasks = tasks_query.order_by(func.random()).limit(prefetcher.size).all()
         else:
-            category = Category.query.filter_by(name=category_name).first()
-        
+            tasks = draw_preferred_tasks(user, tasks_query, prefetcher.size)
+        entries = [
+            {
+                "id": task_id,
+                "description": description,
+                "category": name,
+                "user_id": user.id,
+            }
+            for task_id, description, name in tasks
+        ]
+
+    prefetcher.push(telegram_id, category_name, version, entries)
+    return len(entries)
+
+def draw_preferred_tasks(user, tasks_query, count):
+    """
+    Up to `count` random tasks of `tasks_query`, each in a category drawn
+    from the user's learnt weights like `choose_category` does, so a queue
+    without a category serves the same mix as the database path.
+    """
+    category_ids = [category_sampler.choose(user) for _ in range(count)]
+    tasks = {}
+    for category_id, draws in Counter(category_ids).items():
+        if category_id is not None:
+            tasks[category_id] = (
+                tasks_query.filter(Task.category_id == category_id)
+                .order_by(func.random())
+                .limit(draws)
+                .all()
+            )
+    return [tasks[category_id].pop() for category_id in category_ids if tasks.get(category_id)]
+    
+@handle_errors
+def bulk_assign_tasks(data):
+    """
+    Check the category up front, so a bad request still gets its status code,
+    then return the NDJSON lines of the assignments.
+    """
+    category_name = data.get("category_name")
+
+    tasks_query = db.session.query(Task.category_id, Task.id).join(Category, Task.category_id == Category.id)
+    if category_name:
+        category = Category.query.filter_by(name=category_name).first()
         if not category:
             raise NotFoundError("Category not found")
+        tasks_query = tasks_query.filter(Task.category_id == category.id)
 
-        task = Task.query.filter_by(category_id=category.id).order_by(func.random()).first()
-        if not task:
-            raise NotFoundError("Task not found")
+    task_ids = defaultdict(list)
+    for category_id, task_id in tasks_query.all():
+        task_ids[category_id].append(task_id)
+    if not task_ids:
+        raise NotFoundError("Task not found")
 
-        assign_task_to_user(task.id, user.id)
+    return bulk_assignment_lines(data, dict(task_ids))
 
-        result = {
-            "id": task.id,
-            "description": task.description,
-            "category": category.name,
-        }        
-        return result
+def bulk_assignment_lines(data, task_ids):
+    """
+    Assign a random task to every matching user, chunk by chunk: a handful of
+    set-wise queries and one multi-row insert per chunk, whatever its size.
+    """
+    telegram_ids = data.get("telegram_ids")
+    created_after = data.get("created_after")
+    created_before = data.get("created_before")
+    chunk_size = current_app.config["BULK_ASSIGN_CHUNK_SIZE"]
+
+    users_query = db.session.query(User.id, User.telegram_id)
+    if telegram_ids is not None:
+        users_query = users_query.filter(User.telegram_id.in_(telegram_ids))
+    if created_after:
+        users_query = users_query.filter(User.created_at >= created_after)
+    if created_before:
+        users_query = users_query.filter(User.created_at < created_before)
+
+    try:
+        category_names = dict(db.session.query(Category.id, Category.name).all())
+        last_user_id = 0
+        while True:
+            users = users_query.filter(User.id > last_user_id).order_by(User.id).limit(chunk_size).all()
+            if not users:
+                break
+            last_user_id = users[-1].id
+            user_ids = [user_id for user_id, _ in users]
+
+            seen_task_ids = defaultdict(set)
+            seen = seen_tasks_query(user_ids)
+            for user_id, task_id in db.session.execute(select(seen.c.user_id, seen.c.task_id)):
+                seen_task_ids[user_id].add(task_id)
+
+            categories = choose_bulk_categories(user_ids, list(task_ids))
+            chosen = {
+                user_id: choose_unseen_task(task_ids[categories[user_id]], seen_task_ids[user_id])
+                for user_id in user_ids
+            }
+            descriptions = dict(
+                db.session.query(Task.id, Task.description)
+                .filter(Task.id.in_(set(chosen.values())))
+                .all()
+            )
+
+            insert_user_tasks([(task_id, user_id) for user_id, task_id in chosen.items()])
+            db.session.commit()
+
+            for user_id, telegram_id in users:
+                task_id = chosen[user_id]
+                yield ndjson_line({
+                    "telegram_id": telegram_id,
+                    "task": {
+                        "id": task_id,
+                        "description": descriptions[task_id],
+                        "category": category_names[categories[user_id]],
+                    },
+                })
 
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
     except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
-    
+        # Chunks already sent are committed, the client sees where it stopped
+        db.session.rollback()
+        yield ndjson_line(DatabaseError(f"Database error: {str(e)}").to_dict())
+
+def choose_bulk_categories(user_ids, category_ids):
+    """
+    Weighted random category per user from the learnt preferences, like
+    `choose_category` but with one query for the whole chunk.
+    """
+    if len(category_ids) == 1:
+        return dict.fromkeys(user_ids, category_ids[0])
+
+    weights = defaultdict(dict)
+    preferences_query = (
+        db.session.query(UserCategoryPreference.user_id, UserCategoryPreference.category_id, UserCategoryPreference.weight)
+        .filter(UserCategoryPreference.user_id.in_(user_ids))
+    )
+    for user_id, category_id, weight in preferences_query:
+        weights[user_id][category_id] = weight
+
+    base_weight = category_sampler.base_weight
+    categories = {}
+    for user_id in user_ids:
+        user_weights = weights.get(user_id)
+        if not user_weights:
+            categories[user_id] = random.choice(category_ids)
+            continue
+        categories[user_id] = random.choices(
+            category_ids,
+            [base_weight + user_weights.get(category_id, 0) for category_id in category_ids],
+        )[0]
+    return categories
+
+def seen_tasks_query(user_ids):
+    """
+    `(user_id, task_id)` of the tasks assigned to the users, archived assignments included.
+    """
+    return union_all(
+        select(UserTask.user_id, UserTask.task_id).where(UserTask.user_id.in_(user_ids)),
+        select(UserTaskArchive.user_id, UserTaskArchive.task_id).where(UserTaskArchive.user_id.in_(user_ids)),
+    ).subquery()
+
+def choose_unseen_task(task_ids, seen_task_ids, attempts=8):
+    for _ in range(attempts):
+        task_id = random.choice(task_ids)
+        if task_id not in seen_task_ids:
+            return task_id
+
+    unseen_task_ids = [task_id for task_id in task_ids if task_id not in seen_task_ids]
+    # The user has seen the whole category, repeat a task like /tasks/get does
+    return random.choice(unseen_task_ids or task_ids)
+
+def record_completed_categories(calls):
+    """
+    Learn the users' category weights from completed tasks.
+    """
+    task_categories = dict(
+        db.session.query(Task.id, Task.category_id)
+        .filter(Task.id.in_({task_id for task_id, _ in calls}))
+        .all()
+    )
+    weights = Counter(
+        (user_id, task_categories[task_id])
+        for task_id, user_id in calls
+        if task_id in task_categories
+    )
+    if not weights:
+        return
+
+    statement = insert(UserCategoryPreference).values([
+        {"user_id": user_id, "category_id": category_id, "weight": count}
+        for (user_id, category_id), count in weights.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "category_id"],
+        set_={
+            "weight": UserCategoryPreference.__table__.c.weight + statement.excluded.weight,
+            "updated_at": func.now(),
+        },
+    )
+    db.session.execute(statement)
+    # No cached response shows the version, it must not invalidate /users/<id>
+    (
+        User.query.filter(User.id.in_({user_id for user_id, _ in weights}))
+        .execution_options(http_cache=False)
+        .update({"category_weights_version": User.category_weights_version + 1}, synchronize_session=False)
+    )
+
+def mark_user_tasks_completed(calls):
+    pairs = list(dict.fromkeys((task_id, user_id) for task_id, user_id, _ in calls))
+    first_completions = list(dict.fromkeys(
+        (task_id, user_id) for task_id, user_id, first_completion in calls if first_completion
+    ))
+    if first_completions:
+        record_completed_categories(first_completions)
+
+    UserTask.query.filter(tuple_(UserTask.task_id, UserTask.user_id).in_(pairs)).update(
+        {"status": "completed", "completed_at": datetime.now()},
+        synchronize_session=False,
+    )
+    return [None] * len(calls)
+
+@coalesce_with(mark_user_tasks_completed)
+def mark_user_task_completed(task_id, user_id, first_completion):
+    mark_user_tasks_completed([(task_id, user_id, first_completion)])
+
+@handle_errors
 def complete_task(id, request_data):
-    try:
-        telegram_id = request_data.get("telegram_id")
-
-        user = User.query.filter_by(telegram_id=telegram_id).first()
-        if not user:
-            raise NotFoundError("User not found") 
-        
-        user_task = UserTask.query.filter_by(task_id=id, user_id=user.id).first()
-        if not user_task:
-            raise NotFoundError("User task not found") 
-        
-        user_task.status = "completed"
-        user_task.completed_at = datetime.now()
-        db.session.commit()
-        
-        result = {"message": "Task completed successfully"}
-        return result
+    telegram_id = request_data.get("telegram_id")
+
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if not user:
+        raise NotFoundError("User not found") 
     
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
\ No newline at end of file
+    user_task = UserTask.query.filter_by(task_id=id, user_id=user.id).first()
+    if not user_task:
+        raise NotFoundError("User task not found") 
+    
+    run_write(mark_user_task_completed, id, user.id, user_task.status != "completed")
+    category_sampler.invalidate(user.id)
+    
+    result = {"message": "Task completed successfully"}
+    return result
\ No newline at end of file
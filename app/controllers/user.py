@@ -1,170 +1,221 @@
-from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
 
 from app.models.user import User
 from app.models.task import Task
 from app.models.user_task import UserTask
+from app.models.user_task_archive import UserTaskArchive
 from app.models.category import Category
-from app.common.db import db
-from app.common.exceptions import DatabaseError, NotFoundError, AlreadyExistsError
+from app.common.db import db, read_only
+from app.common.jobs import register_job
+from app.common.prefetch import prefetcher
+from app.common.errors import handle_errors
+from app.common.exceptions import NotFoundError, AlreadyExistsError
 
+@handle_errors
 def create_user(data):
-    try:    
-        telegram_id = data.get("telegram_id")
-        username = data.get("username")
-        first_name = data.get("first_name")
-        last_name = data.get("last_name")
-
-        user = User.query.filter_by(telegram_id=telegram_id).first()
-        if user:
-            raise AlreadyExistsError("User already exists.")
-
-        user = User(
-            telegram_id = telegram_id,
-            username = username,
-            first_name = first_name,
-            last_name = last_name,
-        )
-        db.session.add(user)
-        db.session.commit()
-        result = {
-            "id": user.id,
-            "telegram_id": user.telegram_id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-        }
-        return result
-    except AlreadyExistsError as e:
-        raise AlreadyExistsError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    telegram_id = data.get("telegram_id")
+    username = data.get("username")
+    first_name = data.get("first_name")
+    last_name = data.get("last_name")
 
-def get_all_users():
-    try:
-        users = User.query.all()
-        result = [
-            {
-                "id": user.id,
-                "telegram_id": user.telegram_id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-            }
-            for user in users
-        ]
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if user:
+        raise AlreadyExistsError("User already exists.")
 
-        return result
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    user = User(
+        telegram_id = telegram_id,
+        username = username,
+        first_name = first_name,
+        last_name = last_name,
+    )
+    db.session.add(user)
+    db.session.commit()
+    result = {
+        "id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+    }
+    return result
 
-def get_user_by_id(id):
-    try:
-        user = User.query.get(id)
-        if not user:
-            raise NotFoundError("User not found.")
-        
-        result = {
+@read_only
+@handle_errors
+def get_all_users():
+    users = User.query.all()
+    result = [
+        {
             "id": user.id,
             "telegram_id": user.telegram_id,
             "username": user.username,
             "first_name": user.first_name,
             "last_name": user.last_name,
         }
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+        for user in users
+    ]
+
+    return result
+
+@read_only
+@handle_errors
+def get_user_by_id(id):
+    user = User.query.get(id)
+    if not user:
+        raise NotFoundError("User not found.")
+    
+    result = {
+        "id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+    }
+    return result
 
+@handle_errors
 def update_user(id, data):
-    try:
-        user = User.query.get(id)
-        if not user:
-            raise NotFoundError("User not found.")
-        
-        if "telegram_id" in data:
-            user.telegram_id = data.get("telegram_id")
-        if "first_name" in data:
-            user.first_name = data.get("first_name")
-        if "username" in data:
-            user.username = data.get("username")
-        if "last_name" in data:
-            user.last_name = data.get("last_name")
+    user = User.query.get(id)
+    if not user:
+        raise NotFoundError("User not found.")
+    
+    if "telegram_id" in data:
+        user.telegram_id = data.get("telegram_id")
+    if "first_name" in data:
+        user.first_name = data.get("first_name")
+    if "username" in data:
+        user.username = data.get("username")
+    if "last_name" in data:
+        user.last_name = data.get("last_name")
 
-        db.session.commit()
-        result = {
-            "id": user.id,
-            "telegram_id": user.telegram_id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-        }        
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    db.session.commit()
+    result = {
+        "id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+    }        
+    return result
 
+@handle_errors
 def delete_user(id):
-    try:
-        user = User.query.get(id)
-        if not user:
-            raise NotFoundError("User not found.")
-        
-        db.session.delete(user)
-        db.session.commit()
-        result = {"message": "User deleted successfully"}
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+    user = User.query.get(id)
+    if not user:
+        raise NotFoundError("User not found.")
+    
+    db.session.delete(user)
+    db.session.commit()
+    prefetcher.invalidate()
+    result = {"message": "User deleted successfully"}
+    return result
 
+@read_only
+@handle_errors
 def get_user_tasks(request_data):
-    try:
-        telegram_id = request_data.get("telegram_id")
-        status = request_data.get("status")
+    telegram_id = request_data.get("telegram_id")
+    status = request_data.get("status")
 
-        user = User.query.filter_by(telegram_id=telegram_id).first()
-        if not user:
-            raise NotFoundError("User not found.")
+    user = User.query.filter_by(telegram_id=telegram_id).first()
+    if not user:
+        raise NotFoundError("User not found.")
 
-        user_tasks_query = (
-            db.session.query(Task, UserTask, Category)
-            .join(UserTask, Task.id == UserTask.task_id)
-            .join(Category, Task.category_id == Category.id)
-            .filter(UserTask.user_id == user.id)
-        )
-        if status:
-            user_tasks_query = user_tasks_query.filter(UserTask.status == status)
+    user_tasks_query = (
+        db.session.query(Task, UserTask, Category)
+        .join(UserTask, Task.id == UserTask.task_id)
+        .join(Category, Task.category_id == Category.id)
+        .filter(UserTask.user_id == user.id)
+    )
+    if status:
+        user_tasks_query = user_tasks_query.filter(UserTask.status == status)
 
-        user_tasks = user_tasks_query.all()
+    user_tasks = user_tasks_query.all()
 
-        result = [
+    result = [
+        {
+            "task_id": task.id,
+            "description": task.description,
+            "category_name": category.name,
+            "status": user_task.status,
+            "assigned_at": user_task.created_at,
+            "completed_at": user_task.completed_at,
+        }
+        for task, user_task, category in user_tasks
+    ]
+
+    # Archived assignments are all completed ones
+    if request_data.get("include_archive") and status in ("", None, "completed"):
+        archived_tasks = (
+            db.session.query(Task, UserTaskArchive, Category)
+            .join(UserTaskArchive, Task.id == UserTaskArchive.task_id)
+            .join(Category, Task.category_id == Category.id)
+            .filter(UserTaskArchive.user_id == user.id)
+            .all()
+        )
+        result.extend(
             {
                 "task_id": task.id,
                 "description": task.description,
                 "category_name": category.name,
-                "status": user_task.status,
-                "assigned_at": user_task.created_at,
-                "completed_at": user_task.completed_at,
+                "status": "completed",
+                "assigned_at": archived_task.created_at,
+                "completed_at": archived_task.completed_at,
             }
-            for task, user_task, category in user_tasks
-        ]
-        return result
-    except NotFoundError as e:
-        raise NotFoundError(f"{str(e)}")
-    except SQLAlchemyError as e:
-        raise DatabaseError(f"Database error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Unexpected error occurred: {str(e)}")
+            for task, archived_task, category in archived_tasks
+        )
+    return result
+
+
+def ensure_archive_partitions(months):
+    """
+    Create the monthly partitions of user_tasks_archive (Postgres) that rows of `months` go to.
+    """
+    for month in sorted(months):
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS user_tasks_archive_{month:%Y_%m} "
+            f"PARTITION OF user_tasks_archive "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        ))
+
+@register_job("user_tasks.archive")
+def archive_user_tasks(older_than_days, batch_size):
+    """
+    Move completed assignments older than `older_than_days` to user_tasks_archive,
+    one transaction per batch. Returns the number of rows moved.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    partitioned = db.engine.dialect.name == "postgresql"
+    columns = ["id", "completed_at", "user_id", "task_id", "created_at"]
+    archived = 0
+
+    while True:
+        rows = (
+            db.session.query(UserTask.id, UserTask.completed_at)
+            .filter(UserTask.status == "completed", UserTask.completed_at < cutoff)
+            .order_by(UserTask.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        ids = [user_task_id for user_task_id, _ in rows]
+        if partitioned:
+            ensure_archive_partitions({
+                completed_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0).date()
+                for _, completed_at in rows
+            })
+
+        db.session.execute(
+            UserTaskArchive.__table__.insert().from_select(
+                columns,
+                select(*(getattr(UserTask, column) for column in columns)).where(UserTask.id.in_(ids)),
+            )
+        )
+        UserTask.query.filter(UserTask.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        archived += len(ids)
+
+    return archived
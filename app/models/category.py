@@ -1,8 +1,32 @@
-from app.common.db import db
+from sqlalchemy import event
+from sqlalchemy.orm import with_loader_criteria
+
+from app.common.db import db, RoutingSession
 
 class Category(db.Model):
     __tablename__ = "categories"
     id = db.Column(db.Integer, primary_key=True, nullable=False, unique=True)
     name = db.Column(db.String(80), nullable=False, unique=True)
+    deleted_at = db.Column(db.DateTime, nullable=True) # hidden until `categories.purge` removes the row
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _hide_deleted_categories(orm_execute_state):
+    """
+    Leave deleted categories out of every ORM query, joins included, unless
+    it runs with `execution_options(include_deleted=True)`.
+
+    Relationship loads are skipped here because they already carry the
+    criteria of the query that loaded the parent: `task.category` is None for
+    a deleted category, unless the task was loaded with `include_deleted`.
+    """
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(Category, Category.deleted_at.is_(None), include_aliases=True)
+        )
@@ -4,8 +4,21 @@ class Task(db.Model):
     __tablename__ = "tasks"
     id = db.Column(db.Integer, primary_key=True, nullable=False, unique=True)
     description = db.Column(db.String(500), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
-    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+    # Indexed for the incremental poll of the task catalogue
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), index=True)
 
-    category = db.relationship("Category", backref="tasks", cascade="all, delete", passive_deletes=True)
\ No newline at end of file
+    # Children are removed by ON DELETE CASCADE, the ORM does not load them
+    category = db.relationship("Category", backref=db.backref("tasks", cascade="all, delete", passive_deletes=True))
+
+def search_vector(description):
+    # Must stay identical to the indexed expression below for Postgres to use the index
+    return db.func.to_tsvector(db.text("'english'"), description)
+
+# Full-text search on Postgres, SQLite uses an FTS5 table (app/common/search.py)
+db.Index(
+    "ix_tasks_description_search",
+    search_vector(Task.__table__.c.description),
+    postgresql_using="gin",
+).ddl_if(dialect="postgresql")
@@ -7,5 +7,6 @@ class User(db.Model):
     username = db.Column(db.String(100), nullable=True)
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=True)
+    category_weights_version = db.Column(db.Integer, nullable=False, default=0, server_default="0", info={"http_cache": False}) # bumped when category preferences change
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
\ No newline at end of file
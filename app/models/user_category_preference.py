@@ -0,0 +1,13 @@
+from app.common.db import db
+
+class UserCategoryPreference(db.Model):
+    __tablename__ = "user_category_preferences"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "category_id", name="uq_user_category_preferences_user_id_category_id"),
+    )
+    id = db.Column(db.Integer, primary_key=True, nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id", ondelete="CASCADE"), nullable=False, index=True)
+    weight = db.Column(db.Float, nullable=False, default=0) # learnt from completed tasks
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
@@ -2,6 +2,11 @@ from app.common.db import db
 
 class UserTask(db.Model):
     __tablename__ = "user_tasks"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "task_id", name="uq_user_tasks_user_id_task_id"),
+        db.Index("ix_user_tasks_completed_at", "completed_at"), # rows to archive
+        db.Index("ix_user_tasks_task_id", "task_id"), # cascades from tasks
+    )
     id = db.Column(db.Integer, primary_key=True, nullable=False, unique=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
@@ -10,5 +15,5 @@ class UserTask(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
-    user = db.relationship("User", backref="user_tasks", cascade="all, delete", passive_deletes=True)
-    task = db.relationship("Task", backref="user_tasks", cascade="all, delete", passive_deletes=True)
\ No newline at end of file
+    user = db.relationship("User", backref=db.backref("user_tasks", cascade="all, delete", passive_deletes=True))
+    task = db.relationship("Task", backref=db.backref("user_tasks", cascade="all, delete", passive_deletes=True))
\ No newline at end of file
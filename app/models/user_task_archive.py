@@ -0,0 +1,20 @@
+from app.common.db import db
+
+class UserTaskArchive(db.Model):
+    """
+    Completed assignments moved out of user_tasks by `flask user-tasks archive`.
+    On Postgres the table is range partitioned by month of completion.
+    """
+    __tablename__ = "user_tasks_archive"
+    __table_args__ = (
+        db.Index("ix_user_tasks_archive_user_id", "user_id"),
+        db.Index("ix_user_tasks_archive_task_id", "task_id"), # cascades from tasks
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+    # The partition key has to be part of the primary key
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    completed_at = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True) # when the task was assigned
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
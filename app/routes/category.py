@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 
 from app.common.exceptions import ValidationError
+from app.common.http_cache import conditional
 from app.controllers.category import (
     create_category,
     get_all_categories,
@@ -67,6 +68,7 @@ def create_category_route():
     return jsonify(result), 201
 
 @category_bp.route("/", methods=["GET"])
+@conditional("categories")
 def get_all_categories_route():
     """
     Get a list of all categories
@@ -104,6 +106,7 @@ def get_all_categories_route():
     return jsonify(result), 200
 
 @category_bp.route("/<int:id>", methods=["GET"])
+@conditional("categories")
 def get_category_by_id_route(id):
     """
     Get a category by ID
@@ -216,12 +219,27 @@ def delete_category_route(id):
           example: 1
         description: ID of the category to delete
     responses:
-      204:
-        description: Category successfully deleted
+      202:
+        description: Category hidden, its tasks, assignments and preferences are purged in the background
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                message:
+                  type: string
+                  example: "Category deleted successfully"
+                job_id:
+                  type: string
+                  example: "3f2b6c0e9a6d4d2c8b1e5f7a9c0d1e2f"
+                  description: Poll /jobs/{job_id} for the progress of the purge
+                status:
+                  type: string
+                  example: "queued"
       404:
         description: Category not found
       500:
         description: Internal server error
     """
     result = delete_category(id)
-    return jsonify(result), 204
\ No newline at end of file
+    return jsonify(result), 202
\ No newline at end of file
@@ -0,0 +1,208 @@
+from flask import Blueprint, Response, jsonify, request
+
+from app.common.admin import admin_only
+from app.common.exceptions import ValidationError
+from app.common.profiler import endpoint_profiler
+
+debug_bp = Blueprint("debug", __name__)
+
+DOWNLOAD_FORMATS = {
+    "pstats": ("application/octet-stream", "pstats"),
+    "text": ("text/plain", "txt"),
+    "collapsed": ("text/plain", "collapsed"),
+}
+
+@debug_bp.route("/profile", methods=["POST"])
+@admin_only
+def start_profile_route():
+    """
+    Profile the next requests of an endpoint in this worker
+    ---
+    tags:
+      - Debug
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+      - in: query
+        name: endpoint
+        required: true
+        schema:
+          type: string
+          example: "tasks.generate_task_route"
+        description: Flask endpoint name, blueprint and view function
+      - in: query
+        name: n
+        required: false
+        schema:
+          type: integer
+          example: 100
+        description: Number of requests to profile
+      - in: query
+        name: mode
+        required: false
+        schema:
+          type: string
+          enum: [cprofile, sample]
+          example: "cprofile"
+        description: cProfile (pstats output) or stack sampling (collapsed stacks for flamegraphs)
+    responses:
+      200:
+        description: Capture started, it replaces a running one
+        content:
+          application/json:
+            schema:
+              type: object
+              example: {"endpoint": "tasks.generate_task_route", "mode": "cprofile", "requests": 100, "profiled": 0, "started_at": 1735689600.0}
+      400:
+        description: Validation error (invalid mode or number of requests)
+      403:
+        description: Invalid admin key
+      404:
+        description: Unknown endpoint, or profiling disabled (no ADMIN_API_KEY)
+    """
+    endpoint = request.args.get("endpoint")
+    if not endpoint:
+        raise ValidationError("Missing required query parameter: endpoint")
+
+    requests = request.args.get("n", 100)
+    try:
+        requests = int(requests)
+    except ValueError:
+        raise ValidationError("Invalid n. Expected an integer.")
+
+    result = endpoint_profiler.start(endpoint, requests, request.args.get("mode", "cprofile"))
+    return jsonify(result), 200
+
+@debug_bp.route("/profile", methods=["GET"])
+@admin_only
+def get_profile_status_route():
+    """
+    Get the running capture of this worker and the stored profiles
+    ---
+    tags:
+      - Debug
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+    responses:
+      200:
+        description: Capture status
+        content:
+          application/json:
+            schema:
+              type: object
+              example: {"capture": null, "stored": ["tasks.generate_task_route.4242.pstats"]}
+      403:
+        description: Invalid admin key
+      404:
+        description: Profiling disabled (no ADMIN_API_KEY)
+    """
+    return jsonify(endpoint_profiler.status()), 200
+
+@debug_bp.route("/profile", methods=["DELETE"])
+@admin_only
+def stop_profile_route():
+    """
+    Stop the running capture of this worker, what it profiled so far is stored
+    ---
+    tags:
+      - Debug
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+    responses:
+      200:
+        description: The stopped capture, null if none was running
+      403:
+        description: Invalid admin key
+      404:
+        description: Profiling disabled (no ADMIN_API_KEY)
+    """
+    return jsonify({"capture": endpoint_profiler.stop()}), 200
+
+@debug_bp.route("/profile/<string:endpoint>", methods=["GET"])
+@admin_only
+def download_profile_route(endpoint):
+    """
+    Download the stored profile of an endpoint, added up over the workers
+    ---
+    tags:
+      - Debug
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+      - in: path
+        name: endpoint
+        required: true
+        schema:
+          type: string
+          example: "tasks.generate_task_route"
+      - in: query
+        name: format
+        required: false
+        schema:
+          type: string
+          enum: [pstats, text, collapsed]
+          example: "pstats"
+        description: pstats and text for cProfile captures, collapsed (flamegraph.pl, speedscope) for sampled ones
+    responses:
+      200:
+        description: Profile file
+      400:
+        description: Unknown format
+      403:
+        description: Invalid admin key
+      404:
+        description: No stored profile, or profiling disabled (no ADMIN_API_KEY)
+    """
+    output_format = request.args.get("format", "pstats")
+    if output_format not in DOWNLOAD_FORMATS:
+        raise ValidationError(f"Unknown format: {output_format}. Expected one of: {', '.join(DOWNLOAD_FORMATS)}")
+
+    mimetype, extension = DOWNLOAD_FORMATS[output_format]
+    body = endpoint_profiler.load(endpoint, output_format)
+    headers = {"Content-Disposition": f'attachment; filename="{endpoint}.{extension}"'}
+    return Response(body, mimetype=mimetype, headers=headers)
+
+@debug_bp.route("/profile/<string:endpoint>", methods=["DELETE"])
+@admin_only
+def delete_profile_route(endpoint):
+    """
+    Delete the stored profiles of an endpoint
+    ---
+    tags:
+      - Debug
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+      - in: path
+        name: endpoint
+        required: true
+        schema:
+          type: string
+          example: "tasks.generate_task_route"
+    responses:
+      204:
+        description: Stored profiles deleted
+      403:
+        description: Invalid admin key
+      404:
+        description: Profiling disabled (no ADMIN_API_KEY)
+    """
+    endpoint_profiler.clear(endpoint)
+    return "", 204
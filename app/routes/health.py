@@ -0,0 +1,89 @@
+from flask import Blueprint, jsonify
+
+from app.common.admin import admin_only
+from app.common.pool import pool_monitor
+from app.common.catalogue import task_catalogue
+
+health_bp = Blueprint("health", __name__)
+
+@health_bp.route("/pool", methods=["GET"])
+@admin_only
+def get_pool_stats_route():
+    """
+    Get the database connection pool counters of this worker
+    ---
+    tags:
+      - Health
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+    responses:
+      200:
+        description: Counters per engine, "default" and "replica" if configured
+        content:
+          application/json:
+            schema:
+              type: object
+              example:
+                default:
+                  pool: "QueuePool"
+                  size: 5
+                  capacity: 15
+                  checkouts: 1024
+                  checked_out: 2
+                  peak_checked_out: 15
+                  exhausted: 3
+                  timeouts: 1
+                  invalidated: 0
+      403:
+        description: Invalid admin key
+      404:
+        description: Disabled, no ADMIN_API_KEY
+    """
+    return jsonify(pool_monitor.stats()), 200
+
+@health_bp.route("/catalogue", methods=["GET"])
+@admin_only
+def get_catalogue_stats_route():
+    """
+    Get the size and memory use of the task catalogue of this worker
+    ---
+    tags:
+      - Health
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+    responses:
+      200:
+        description: Catalogue counters, "loaded" is false while it loads or when TASK_CATALOGUE_ENABLED is off
+        content:
+          application/json:
+            schema:
+              type: object
+              example:
+                enabled: true
+                loaded: true
+                loaded_at: 1735689600.0
+                tasks: 100000
+                changes: 12
+                categories: 8
+                bytes:
+                  ids: 400000
+                  codes: 200000
+                  offsets: 400004
+                  descriptions: 6512345
+                  category_positions: 400000
+                bytes_per_task: 79.1
+                bytes_per_million_tasks: 79123490
+      403:
+        description: Invalid admin key
+      404:
+        description: Disabled, no ADMIN_API_KEY
+    """
+    return jsonify(task_catalogue.stats()), 200
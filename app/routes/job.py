@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify
+
+from app.controllers.job import get_job_by_id
+
+job_bp = Blueprint("jobs", __name__)
+
+@job_bp.route("/<string:id>", methods=["GET"])
+def get_job_by_id_route(id):
+    """
+    Get the status of a background job
+    ---
+    tags:
+      - Jobs
+    parameters:
+      - in: path
+        name: id
+        required: true
+        schema:
+          type: string
+          example: "3f2b6c0e9a6d4d2c8b1e5f7a9c0d1e2f"
+        description: ID of the job
+    responses:
+      200:
+        description: Job status
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                id:
+                  type: string
+                  example: "3f2b6c0e9a6d4d2c8b1e5f7a9c0d1e2f"
+                name:
+                  type: string
+                  example: "tasks.generate"
+                status:
+                  type: string
+                  example: "finished"
+                attempts:
+                  type: integer
+                  example: 1
+                result:
+                  type: object
+                  example: {"id": 1, "description": "Write a letter to your future self.", "category": "Personal"}
+                progress:
+                  type: object
+                  example: null
+                  description: Reported by long jobs while they run, e.g. rows deleted so far by categories.purge
+                error:
+                  type: string
+                  example: null
+      404:
+        description: Job not found
+      500:
+        description: Internal server error
+    """
+    result = get_job_by_id(id)
+    return jsonify(result), 200
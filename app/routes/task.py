@@ -1,15 +1,24 @@
-from flask import Blueprint, jsonify, request
+from datetime import datetime
 
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.common.admin import admin_only
 from app.common.limiter import limiter
 from app.common.exceptions import ValidationError
+from app.common.http_cache import conditional
+from app.common.compact import task_response
 from app.controllers.task import (
     create_task,
     get_all_tasks,
     get_task_by_id,
+    search_tasks,
     update_task,
     delete_task,
     generate_task,
+    enqueue_generate_task,
+    stream_generate_task,
     assign_existing_task,
+    bulk_assign_tasks,
     complete_task
 )
 
@@ -110,7 +119,85 @@ def get_all_tasks_route():
     result = get_all_tasks()
     return jsonify(result), 200
 
+@task_bp.route("/search", methods=["GET"])
+def search_tasks_route():
+    """
+    Search tasks by description
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: query
+        name: q
+        required: true
+        schema:
+          type: string
+          example: "letter future"
+        description: Words to search for, every word must match
+      - in: query
+        name: category
+        required: false
+        schema:
+          type: string
+          example: "Personal"
+        description: Only return tasks of this category
+      - in: query
+        name: page
+        required: false
+        schema:
+          type: integer
+          example: 1
+      - in: query
+        name: per_page
+        required: false
+        schema:
+          type: integer
+          example: 20
+        description: Results per page, at most 100
+    responses:
+      200:
+        description: Matching tasks, best match first
+        content:
+          application/json:
+            schema:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 1
+                  description:
+                    type: string
+                    example: "Write a letter to your future self."
+                  category:
+                    type: string
+                    example: "Personal"
+      400:
+        description: Validation error (missing or invalid query parameters)
+      500:
+        description: Internal server error
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        raise ValidationError("Missing required query parameter: q")
+
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 20, type=int)
+    if page < 1 or not 1 <= per_page <= 100:
+        raise ValidationError("page must be >= 1 and per_page between 1 and 100.")
+
+    request_data = {}
+    request_data["query"] = query
+    request_data["category_name"] = request.args.get("category")
+    request_data["page"] = page
+    request_data["per_page"] = per_page
+
+    result = search_tasks(request_data)
+    return jsonify(result), 200
+
 @task_bp.route("/<int:id>", methods=["GET"])
+@conditional("tasks", "categories")
 def get_task_by_id_route(id):
     """
     Get a task by ID
@@ -257,6 +344,20 @@ def generate_task_route():
     ---
     tags:
       - Tasks
+    parameters:
+      - in: query
+        name: compact
+        required: false
+        schema:
+          type: integer
+          example: 1
+        description: "Respond with `[id, description]` only. `Accept: application/msgpack` returns the same array as MessagePack"
+      - in: header
+        name: X-Bot-Key
+        required: false
+        schema:
+          type: string
+        description: One of BOT_API_KEYS, leaves out the browser security headers
     requestBody:
       description: JSON object containing the category and telegram_id to generate a task
       required: true
@@ -271,12 +372,50 @@ def generate_task_route():
               category:
                 type: string
                 example: "Personal"
+              async:
+                type: boolean
+                example: false
+                description: Run the generation in the background and poll /jobs/{job_id}
+              stream:
+                type: boolean
+                example: false
+                description: Relay the generation as Server-Sent Events, a `start` event, `token` events while the completion is generated, then a `task` (or `error`) event
             required:
               - telegram_id
     responses:
+      202:
+        description: Generation queued
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                job_id:
+                  type: string
+                  example: "3f2b6c0e9a6d4d2c8b1e5f7a9c0d1e2f"
+                status:
+                  type: string
+                  example: "queued"
       200:
         description: Task generated successfully
         content:
+          text/event-stream:
+            schema:
+              type: string
+              example: |
+                event: start
+                data: {"category": "Personal"}
+
+                event: token
+                data: {"content": "Write"}
+
+                event: task
+                data: {"id": 1, "description": "Write a letter to your future self.", "category": "Personal"}
+          application/msgpack:
+            schema:
+              type: string
+              format: binary
+              description: "[id, description] as MessagePack"
           application/json:
             schema:
               type: object
@@ -294,6 +433,8 @@ def generate_task_route():
         description: Validation error (missing required fields or invalid input)
       404:
         description: Category or user not found
+      429:
+        description: Rate limit exceeded, or the generation budget is used up and the category has no existing task to serve
       500:
         description: Internal server error
     """
@@ -311,8 +452,17 @@ def generate_task_route():
     request_data["telegram_id"] = data.get("telegram_id")
     request_data["category_name"] = data.get("category", "")
 
+    if data.get("async"):
+        result = enqueue_generate_task(request_data)
+        return jsonify(result), 202
+
+    if data.get("stream"):
+        events = stream_generate_task(request_data)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers=headers)
+
     result = generate_task(request_data)
-    return jsonify(result), 200
+    return task_response(result, 200)
 
 @task_bp.route("/get", methods=["POST"])
 def assign_existing_task_route():
@@ -321,6 +471,20 @@ def assign_existing_task_route():
     ---
     tags:
       - Tasks
+    parameters:
+      - in: query
+        name: compact
+        required: false
+        schema:
+          type: integer
+          example: 1
+        description: "Respond with `[id, description]` only. `Accept: application/msgpack` returns the same array as MessagePack"
+      - in: header
+        name: X-Bot-Key
+        required: false
+        schema:
+          type: string
+        description: One of BOT_API_KEYS, leaves out the browser security headers
     requestBody:
       description: JSON object containing the telegram_id and optionally a category to assign an existing task
       required: true
@@ -341,6 +505,11 @@ def assign_existing_task_route():
       200:
         description: Successfully assigned an existing task to the user
         content:
+          application/msgpack:
+            schema:
+              type: string
+              format: binary
+              description: "[id, description] as MessagePack"
           application/json:
             schema:
               type: object
@@ -376,7 +545,94 @@ def assign_existing_task_route():
     request_data["category_name"] = data.get("category", "")
 
     result = assign_existing_task(request_data)
-    return jsonify(result), 200
+    return task_response(result, 200)
+
+@task_bp.route("/assign-bulk", methods=["POST"])
+@limiter.limit("10 per hour")
+@admin_only
+def bulk_assign_tasks_route():
+    """
+    Assign a random task to many users at once
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - in: header
+        name: X-Admin-Key
+        required: true
+        schema:
+          type: string
+    requestBody:
+      description: JSON object selecting the users, and optionally the category of the tasks (by default each user's learnt preferences)
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              category:
+                type: string
+                example: "Personal"
+              telegram_ids:
+                type: array
+                items:
+                  type: integer
+                example: [123456789, 987654321]
+                description: Only these users (default all users)
+              created_after:
+                type: string
+                format: date-time
+                example: "2024-01-01T00:00:00"
+                description: Only users registered at or after this time
+              created_before:
+                type: string
+                format: date-time
+                example: "2025-01-01T00:00:00"
+                description: Only users registered before this time
+    responses:
+      200:
+        description: One JSON line per assigned user, written as the assignments are committed
+        content:
+          application/x-ndjson:
+            schema:
+              type: string
+              example: |
+                {"telegram_id": 123456789, "task": {"id": 1, "description": "Write a letter to your future self.", "category": "Personal"}}
+                {"telegram_id": 987654321, "task": {"id": 7, "description": "Take a photo of something blue.", "category": "Personal"}}
+      400:
+        description: Validation error (invalid input)
+      403:
+        description: Invalid admin key
+      404:
+        description: Category not found, no task to assign, or bulk assignment disabled (no ADMIN_API_KEY)
+      429:
+        description: Rate limit exceeded
+      500:
+        description: Internal server error
+    """
+    data = request.get_json()
+
+    # An empty object is valid: every user, their preferred categories
+    if not isinstance(data, dict):
+        raise ValidationError("Invalid request body. Expected a JSON object.")
+
+    telegram_ids = data.get("telegram_ids")
+    if telegram_ids is not None and (
+        not isinstance(telegram_ids, list) or not all(isinstance(telegram_id, int) for telegram_id in telegram_ids)
+    ):
+        raise ValidationError("telegram_ids must be a list of integers.")
+
+    request_data = {}
+    request_data["category_name"] = data.get("category", "")
+    request_data["telegram_ids"] = telegram_ids
+    for field in ["created_after", "created_before"]:
+        try:
+            request_data[field] = datetime.fromisoformat(data[field]) if data.get(field) else None
+        except (TypeError, ValueError):
+            raise ValidationError(f"{field} must be an ISO 8601 date or date-time.")
+
+    lines = bulk_assign_tasks(request_data)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
 
 @task_bp.route("/<int:id>/complete", methods=["POST"])
 def complete_task_route(id):
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 
 from app.common.exceptions import ValidationError
+from app.common.http_cache import conditional
 from app.controllers.user import (
     create_user,
     get_all_users,
@@ -132,6 +133,7 @@ def get_all_users_route():
     return jsonify(result), 200
 
 @user_bp.route("/<int:id>", methods=["GET"])
+@conditional("users")
 def get_user_by_id_route(id):
     """
     Get a user by ID
@@ -309,6 +311,13 @@ def get_user_tasks_route(telegram_id):
           type: string
           example: "completed"
         description: Filter tasks by status (optional)
+      - in: query
+        name: archive
+        required: false
+        schema:
+          type: boolean
+          example: false
+        description: Also return completed tasks moved to the archive (optional)
     responses:
       200:
         description: List of tasks for the user
@@ -347,6 +356,7 @@ def get_user_tasks_route(telegram_id):
     request_data = {}
     request_data["telegram_id"] = telegram_id
     request_data["status"] = status
+    request_data["include_archive"] = request.args.get("archive", "false").lower() == "true"
 
     result = get_user_tasks(request_data)
     return jsonify(result), 200
\ No newline at end of file
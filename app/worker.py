@@ -0,0 +1,16 @@
+import os
+import argparse
+
+from app import create_app
+from app.common.jobs import job_queue
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background jobs from the Redis queue.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs run at the same time (default: JOB_CONCURRENCY)")
+    args = parser.parse_args()
+
+    create_app(os.getenv("CONFIG_MODE"))
+    job_queue.work(args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Time per request spent on the request thread with access logging, for the
+logging settings in the environment. Runs in process through the Flask test
+client. Log records go to a stream that takes --write-ms per write, like a
+stdout pipe whose reader (a log shipper) falls behind.
+
+    ACCESS_LOG_ENABLED=false CONFIG_MODE=development python benchmarks/access_log.py
+    LOG_QUEUE_ENABLED=false CONFIG_MODE=development python benchmarks/access_log.py --write-ms 1
+    CONFIG_MODE=development python benchmarks/access_log.py --write-ms 1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.common.log import ForkSafeQueueHandler, request_logger
+
+class SlowStream:
+    def __init__(self, write_ms):
+        self.write_ms = write_ms
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.write_ms:
+            time.sleep(self.write_ms / 1000)
+
+    def flush(self):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the request-thread cost of access logging.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--write-ms", type=float, default=0, help="Time each write to the log stream takes")
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    stream = SlowStream(args.write_ms)
+    handler = request_logger.handler
+    (handler.target if isinstance(handler, ForkSafeQueueHandler) else handler).setStream(stream)
+
+    client = app.test_client()
+    headers = {"X-Forwarded-Proto": "https"}
+    for _ in range(200):
+        client.get("/categories/", headers=headers, base_url="https://localhost")
+
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for _ in range(args.requests):
+        client.get("/categories/", headers=headers, base_url="https://localhost")
+    cpu = (time.process_time() - cpu_started) / args.requests
+    wall = (time.perf_counter() - wall_started) / args.requests
+
+    print(f"access log: {app.config['ACCESS_LOG_ENABLED']}, queue: {app.config['LOG_QUEUE_ENABLED']}, "
+          f"sample rate: {app.config['ACCESS_LOG_SAMPLE_RATE']}, write: {args.write_ms} ms")
+    print(f"{wall * 1e6:.0f} us per request, {cpu * 1e6:.0f} us CPU, {stream.writes} lines written so far")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Memory of the task catalogue per million tasks, against holding the same
+tasks as one dict each, and the time of a lookup. Uses generated tasks with
+descriptions of about the length OpenAI returns, no database needed.
+
+    python benchmarks/catalogue.py --tasks 1000000 --categories 20
+
+--workers N then forks N processes that each load their own catalogue, and
+N that map one catalogue file, and adds up their proportional set size
+(PSS, shared pages divided between the processes mapping them). Linux only.
+
+    python benchmarks/catalogue.py --tasks 1000000 --workers 5
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.catalogue import build_snapshot, map_snapshot, write_snapshot
+
+WORDS = "take photo write letter cook dish walk park call friend read chapter plant seed draw sketch learn word".split()
+
+def generate(count, categories):
+    random.seed(42)
+    for task_id in range(1, count + 1):
+        description = " ".join(random.choices(WORDS, k=random.randint(10, 15))).capitalize()
+        yield task_id, random.randint(1, categories), description
+
+def measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+def pss_kib():
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+
+def worker(mode, args, path, barrier, results):
+    # Pages inherited from the parent are divided by the number of children, measure once all are forked
+    barrier.wait()
+    before = pss_kib()
+    barrier.wait()
+    if mode == "shared":
+        snapshot, _ = map_snapshot(path)
+    else:
+        snapshot = build_snapshot(generate(args.tasks, args.categories))
+    # Read every page, as lookups spread over all tasks eventually do
+    for column in (snapshot.ids, snapshot.codes, snapshot.offsets, snapshot.blob, *snapshot.positions.values()):
+        hashlib.md5(memoryview(column).cast("B")).digest()
+    barrier.wait()
+    results.put(pss_kib() - before)
+    barrier.wait()
+
+def measure_workers(args):
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalogue.bin")
+        write_snapshot(path, build_snapshot(generate(args.tasks, args.categories)), 1, None)
+        print(f"catalogue file: {os.path.getsize(path) / 2**20:.1f} MiB")
+        for mode in ("private", "shared"):
+            barrier = context.Barrier(args.workers)
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(mode, args, path, barrier, results)) for _ in range(args.workers)]
+            for process in processes:
+                process.start()
+            total = sum(results.get() for _ in processes)
+            for process in processes:
+                process.join()
+            print(f"{args.workers} workers, {mode}: {total / 1024:.1f} MiB PSS in total")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory of the columnar task catalogue.")
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=0, help="Compare per-worker and shared catalogues over N processes")
+    args = parser.parse_args()
+
+    if args.workers:
+        measure_workers(args)
+        return
+
+    rows = list(generate(args.tasks, args.categories))
+    names = {category_id: f"Category {category_id}" for category_id in range(1, args.categories + 1)}
+    scale = 1000000 / args.tasks
+    text_bytes = sum(len(description.encode()) for _, _, description in rows)
+    print(f"{args.tasks} tasks, {text_bytes / args.tasks:.1f} bytes of description per task")
+
+    snapshot, current, peak, elapsed = measure(lambda: build_snapshot(iter(rows)))
+    print(f"columnar:  {current * scale / 2**20:7.1f} MiB per million tasks, "
+          f"peak while building {peak * scale / 2**20:.1f} MiB, built in {elapsed:.2f} s")
+    for name, size in snapshot.nbytes().items():
+        print(f"  {name:20} {size * scale / 2**20:7.1f} MiB")
+
+    # New strings, as rows fetched from the database would be
+    dicts, current, peak, elapsed = measure(lambda: {
+        task_id: {"id": task_id, "description": description.encode().decode(), "category": names[category_id]}
+        for task_id, category_id, description in rows
+    })
+    print(f"dicts:     {current * scale / 2**20:7.1f} MiB per million tasks")
+
+    task_ids = [random.randint(1, args.tasks) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    for task_id in task_ids:
+        snapshot.row(snapshot.find(task_id))
+    columnar_lookup = (time.perf_counter() - started) / args.lookups
+    started = time.perf_counter()
+    for task_id in task_ids:
+        dicts[task_id]
+    dict_lookup = (time.perf_counter() - started) / args.lookups
+    print(f"lookup: columnar {columnar_lookup * 1e6:.2f} us, dict {dict_lookup * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    main()
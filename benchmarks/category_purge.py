@@ -0,0 +1,98 @@
+"""
+Deleting a large category: one `DELETE` relying on ON DELETE CASCADE, in a
+single transaction, against the batched `categories.purge` job. A thread
+keeps writing meanwhile, one small update and commit at a time, and the
+longest of those writes shows how long the deletion held up other writers.
+
+    CONFIG_MODE=development python benchmarks/category_purge.py --tasks 20000 --assignments 5
+
+Adds a category with --tasks tasks, each assigned to --assignments users,
+for every mode. The database must already contain users.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, text
+
+from app import create_app
+from app.common.db import db
+from app.controllers.category import purge_category
+from app.models.category import Category
+from app.models.task import Task
+from app.models.user import User
+from app.models.user_task import UserTask
+
+def seed(args, user_ids):
+    category = Category(name=f"purge-bench-{time.time()}")
+    db.session.add(category)
+    db.session.commit()
+    db.session.execute(Task.__table__.insert(), [
+        {"description": f"Benchmark task {index}", "category_id": category.id}
+        for index in range(args.tasks)
+    ])
+    task_ids = [task_id for task_id, in db.session.query(Task.id).filter(Task.category_id == category.id)]
+    db.session.execute(UserTask.__table__.insert(), [
+        {"user_id": user_id, "task_id": task_id, "status": "assigned"}
+        for task_id in task_ids
+        for user_id in random.sample(user_ids, args.assignments)
+    ])
+    db.session.commit()
+    return category.id
+
+def cascade(category_id):
+    db.session.execute(text("DELETE FROM categories WHERE id = :id"), {"id": category_id})
+    db.session.commit()
+
+def purge(category_id):
+    Category.query.filter(Category.id == category_id).update({"deleted_at": func.now()})
+    db.session.commit()
+    purge_category(category_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a cascading delete with the batched purge of a category.")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--assignments", type=int, default=5, help="Assignments per task")
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    with app.app_context():
+        user_ids = [user_id for user_id, in db.session.query(User.id).all()]
+    print(f"{'mode':<10}{'delete s':>10}{'writes':>8}{'max write ms':>14}")
+    for name, delete in (("cascade", cascade), ("purge", purge)):
+        with app.app_context():
+            category_id = seed(args, user_ids)
+
+        stop = threading.Event()
+        latencies = []
+
+        def writer():
+            with app.app_context():
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    db.session.execute(text("UPDATE users SET updated_at = updated_at WHERE id = :id"),
+                                       {"id": random.choice(user_ids)})
+                    db.session.commit()
+                    latencies.append(time.perf_counter() - started)
+                    time.sleep(0.005)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(0.2)
+        try:
+            with app.app_context():
+                started = time.perf_counter()
+                delete(category_id)
+                elapsed = time.perf_counter() - started
+        finally:
+            stop.set()
+            thread.join()
+        print(f"{name:<10}{elapsed:>10.2f}{len(latencies):>8}{max(latencies) * 1e3:>14.0f}")
+
+if __name__ == "__main__":
+    main()
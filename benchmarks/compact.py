@@ -0,0 +1,56 @@
+"""
+Bytes and time per `POST /tasks/get` response in each format: the full
+JSON object, `?compact=1` and MessagePack for an authenticated bot client.
+Runs in process through the Flask test client, one random user per request.
+
+    BOT_API_KEYS=bench CONFIG_MODE=development python benchmarks/compact.py --requests 3000
+
+The database must already contain users and tasks, each request assigns one.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.common.db import db
+from app.models.user import User
+
+MODES = {
+    "json": ("", {}),
+    "compact=1": ("?compact=1", {}),
+    "msgpack + X-Bot-Key": ("", {"Accept": "application/msgpack", "X-Bot-Key": "bench"}),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure response bytes and time per format.")
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    if "bench" not in app.config["BOT_API_KEYS"]:
+        sys.exit("Run with BOT_API_KEYS=bench")
+    with app.app_context():
+        telegram_ids = [telegram_id for telegram_id, in db.session.query(User.telegram_id).all()]
+
+    client = app.test_client()
+    print(f"{'mode':<22}{'body B':>8}{'headers B':>11}{'CPU us':>9}{'wall us':>9}")
+    for mode, (query, headers) in MODES.items():
+        headers = {"X-Forwarded-Proto": "https", **headers}
+        body_bytes = header_bytes = 0
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        for _ in range(args.requests):
+            response = client.post(f"/tasks/get{query}", json={"telegram_id": random.choice(telegram_ids)},
+                                   headers=headers, base_url="https://localhost")
+            body_bytes += len(response.data)
+            header_bytes += sum(len(name) + len(value) + 4 for name, value in response.headers.items())
+        cpu = (time.process_time() - cpu_started) / args.requests
+        wall = (time.perf_counter() - wall_started) / args.requests
+        print(f"{mode:<22}{body_bytes / args.requests:>8.0f}{header_bytes / args.requests:>11.0f}"
+              f"{cpu * 1e6:>9.0f}{wall * 1e6:>9.0f}")
+
+if __name__ == "__main__":
+    main()
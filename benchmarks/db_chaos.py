@@ -0,0 +1,110 @@
+"""
+Chaos run for the database error paths: requests arrive at a fixed rate
+while a share of the SQL statements fail, then the failures stop and the
+pool must be back to normal.
+
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=0 DB_POOL_TIMEOUT=2 \
+        CONFIG_MODE=development python benchmarks/db_chaos.py --rps 100 --duration 10
+
+Failures are raised as the driver's own OperationalError before the
+statement reaches the database, so they take the same path as a dropped
+connection or a failed statement. Exits with status 1 if connections are
+still checked out afterwards or a request fails once injection has stopped.
+The database must already contain users and tasks.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app
+from app.common.db import db
+from app.common.pool import pool_monitor
+from app.models.task import Task
+from app.models.user import User
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject database failures under load and check the pool recovers.")
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds with failures injected")
+    parser.add_argument("--recovery", type=float, default=5.0, help="Seconds without failures afterwards")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="Share of statements that fail")
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    with app.app_context():
+        telegram_ids = [telegram_id for telegram_id, in db.session.query(User.telegram_id).all()]
+        task_ids = [task_id for task_id, in db.session.query(Task.id).all()]
+        engines = list(db.engines.values())
+
+    injecting = threading.Event()
+
+    def inject_failure(connection, cursor, statement, parameters, context, executemany):
+        if injecting.is_set() and random.random() < args.failure_rate:
+            raise connection.dialect.dbapi.OperationalError("injected failure")
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", inject_failure)
+
+    headers = {"X-Forwarded-Proto": "https"}
+    statuses = {"chaos": Counter(), "recovery": Counter()}
+    lock = threading.Lock()
+
+    def request(phase):
+        client = app.test_client()
+        choice = random.random()
+        if choice < 0.4:
+            response = client.get(f"/tasks/{random.choice(task_ids)}", headers=headers, base_url="https://localhost")
+        elif choice < 0.7:
+            response = client.post("/tasks/get", json={"telegram_id": random.choice(telegram_ids)},
+                                   headers=headers, base_url="https://localhost")
+        else:
+            response = client.get(f"/users/{random.choice(telegram_ids)}/tasks", headers=headers, base_url="https://localhost")
+        with lock:
+            statuses[phase][response.status_code] += 1
+
+    def run_phase(executor, phase, duration):
+        interval = 1 / args.rps
+        started = time.monotonic()
+        sent = 0
+        while time.monotonic() - started < duration:
+            executor.submit(request, phase)
+            sent += 1
+            time.sleep(max(0, started + sent * interval - time.monotonic()))
+        return sent
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        injecting.set()
+        chaos_sent = run_phase(executor, "chaos", args.duration)
+        injecting.clear()
+        recovery_sent = run_phase(executor, "recovery", args.recovery)
+
+    print(f"chaos:    {chaos_sent} requests, status codes {dict(sorted(statuses['chaos'].items()))}")
+    print(f"recovery: {recovery_sent} requests, status codes {dict(sorted(statuses['recovery'].items()))}")
+
+    failed = False
+    for name, stats in pool_monitor.stats().items():
+        print(f"pool {name}: {stats}")
+        if stats["checked_out"] != 0:
+            print(f"FAIL: {stats['checked_out']} connections of the {name} pool still checked out")
+            failed = True
+
+    errors = sum(count for status, count in statuses["recovery"].items() if status >= 500)
+    if errors:
+        print(f"FAIL: {errors} requests failed after injection stopped")
+        failed = True
+
+    print("FAIL" if failed else "OK: pool recovered")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Minimal HTTP load harness.
+
+    python benchmarks/load.py http://localhost:8000/categories/ -c 16 -d 10
+    python benchmarks/load.py http://localhost:8000/tasks/get -m POST \
+        --json '{"telegram_id": 1}' -c 32 -d 10
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import requests
+
+def worker(args, stop, results, lock):
+    session = requests.Session()
+    headers = {"X-Forwarded-Proto": "https", **dict(h.split(": ", 1) for h in args.header)}
+    body = json.loads(args.json) if args.json else None
+    latencies, errors, received = [], 0, 0
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = session.request(args.method, args.url, json=body, headers=headers, timeout=30)
+            received += len(response.content)
+            if response.status_code >= 500:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    with lock:
+        results["latencies"].extend(latencies)
+        results["errors"] += errors
+        results["bytes"] += received
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of one endpoint.")
+    parser.add_argument("url")
+    parser.add_argument("-m", "--method", default="GET")
+    parser.add_argument("--json", help="JSON request body")
+    parser.add_argument("-H", "--header", action="append", default=[], help="Extra header, 'Name: value'")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"latencies": [], "errors": 0, "bytes": 0}
+    threads = [threading.Thread(target=worker, args=(args, stop, results, lock)) for _ in range(args.concurrency)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results["latencies"])
+    count = len(latencies)
+    if not count:
+        print("No requests completed")
+        return
+
+    def percentile(p):
+        return latencies[min(count - 1, int(count * p))] * 1000
+
+    print(f"requests:   {count} ({results['errors']} errors)")
+    print(f"throughput: {count / elapsed:.1f} req/s")
+    print(f"latency:    mean {statistics.mean(latencies) * 1000:.1f} ms, "
+          f"p50 {percentile(0.50):.1f} ms, p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+    print(f"bytes/req:  {results['bytes'] / count:.0f}")
+
+if __name__ == "__main__":
+    main()
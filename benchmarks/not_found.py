@@ -0,0 +1,56 @@
+"""
+CPU cost of 404 responses, the most frequent error path (bots asking for
+tasks and users that do not exist). Runs in process through the Flask test
+client, so only the app's own work is measured. get_job_by_id does no
+database work, it shows the cost of the error handling alone.
+
+    CONFIG_MODE=development python benchmarks/not_found.py --requests 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.controllers.job import get_job_by_id
+from app.controllers.task import get_task_by_id
+from app.common.exceptions import NotFoundError
+
+MISSING_ID = 2_000_000_000
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CPU time per 404.")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    client = app.test_client()
+    headers = {"X-Forwarded-Proto": "https"}
+    url = f"/tasks/{MISSING_ID}"
+
+    for _ in range(200):
+        client.get(url, headers=headers, base_url="https://localhost")
+
+    started = time.process_time()
+    for _ in range(args.requests):
+        response = client.get(url, headers=headers, base_url="https://localhost")
+    per_request = (time.process_time() - started) / args.requests
+    assert response.status_code == 404, response.status_code
+
+    print(f"GET {url}:   {per_request * 1e6:.1f} us CPU per request")
+
+    with app.app_context():
+        for controller, argument in [(get_task_by_id, MISSING_ID), (get_job_by_id, "missing")]:
+            started = time.process_time()
+            for _ in range(args.requests):
+                try:
+                    controller(argument)
+                except NotFoundError:
+                    pass
+            per_call = (time.process_time() - started) / args.requests
+            print(f"{controller.__name__ + ':':<24}{per_call * 1e6:.1f} us CPU per call")
+
+if __name__ == "__main__":
+    main()
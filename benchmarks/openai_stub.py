@@ -0,0 +1,101 @@
+"""
+Local stand-in for the OpenAI chat completions API, streaming included.
+Start it and point the app at it:
+
+    python benchmarks/openai_stub.py --port 8099 --first-token-ms 300 --token-ms 30
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub python run.py
+
+Every completion is the same sentence, sent word by word when streaming.
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTENCE = "Take a photo of something blue on your way home and share it with a friend."
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = SENTENCE.split(" ")
+        usage = {"prompt_tokens": 80, "completion_tokens": len(words), "total_tokens": 80 + len(words)}
+
+        time.sleep(self.server.first_token_ms / 1000)
+        if not body.get("stream"):
+            time.sleep(self.server.token_ms * (len(words) - 1) / 1000)
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": SENTENCE},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(self.server.token_ms / 1000)
+            content = word if index == 0 else " " + word
+            self._send_chunk(completion_id, body["model"], [{"index": 0, "delta": {"content": content}, "finish_reason": None}])
+        self._send_chunk(completion_id, body["model"], [{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if body.get("stream_options", {}).get("include_usage"):
+            self._send_chunk(completion_id, body["model"], [], usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, completion_id, model, choices, usage=None):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+            "usage": usage,
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), ChatCompletionsHandler)
+    server.first_token_ms = args.first_token_ms
+    server.token_ms = args.token_ms
+    print(f"Serving on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Accuracy and storage round trips of the rate limit strategies. --workers
+limiter instances, each with its own leases like one gunicorn worker, share
+one storage and take hits for --clients clients from one thread each, until
+every client has sent --requests-per-client requests within one window.
+
+    python benchmarks/rate_limit.py --limit "1000/hour"
+    python benchmarks/rate_limit.py --storage redis://localhost:6379/0
+    python benchmarks/rate_limit.py --storage sharded+redis://localhost:6379/0,localhost:6380/0
+
+Exits with status 1 if a strategy admits more than the limit for a client,
+or a leased one admits fewer than `limit - (workers - 1) * lease max`.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from app.common.limiter import LeasedFixedWindowRateLimiter
+
+def count_calls(storage):
+    """
+    Counts the calls made to the storage in `storage.calls`.
+    """
+    storage.calls = 0
+    lock = threading.Lock()
+
+    def counted(method):
+        def call(*args, **kwargs):
+            with lock:
+                storage.calls += 1
+            return method(*args, **kwargs)
+        return call
+
+    for name in ("incr", "get", "get_expiry", "clear"):
+        setattr(storage, name, counted(getattr(storage, name)))
+    return storage
+
+def run(strategy, args, item):
+    storage = count_calls(storage_from_string(args.storage))
+    workers = [strategy(storage) for _ in range(args.workers)]
+    # Fresh keys for every run, the storage may hold counters of earlier ones
+    prefix = f"{strategy.__name__}-{time.time()}"
+    admitted = [0] * args.clients
+
+    def client(index):
+        for _ in range(args.requests_per_client):
+            if random.choice(workers).hit(item, prefix, f"client-{index}"):
+                admitted[index] += 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    requests = args.clients * args.requests_per_client
+    print(f"{strategy.__name__}: admitted per client {min(admitted)}-{max(admitted)} of {item.amount}, "
+          f"{storage.calls} storage calls for {requests} requests ({storage.calls / requests:.3f} per request), "
+          f"{elapsed * 1e6 / requests:.0f} us per request")
+    return admitted
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fixed window and leased fixed window strategies.")
+    parser.add_argument("--storage", default="memory://")
+    parser.add_argument("--limit", default="1000/hour")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests-per-client", type=int, default=1500)
+    parser.add_argument("--lease-fraction", type=float, default=LeasedFixedWindowRateLimiter.lease_fraction)
+    parser.add_argument("--lease-max", type=int, default=LeasedFixedWindowRateLimiter.lease_max)
+    args = parser.parse_args()
+
+    LeasedFixedWindowRateLimiter.lease_fraction = args.lease_fraction
+    LeasedFixedWindowRateLimiter.lease_max = args.lease_max
+    item = parse(args.limit)
+
+    failed = False
+    for strategy in (FixedWindowRateLimiter, LeasedFixedWindowRateLimiter):
+        admitted = run(strategy, args, item)
+        lowest = item.amount
+        if strategy is LeasedFixedWindowRateLimiter:
+            lowest -= (args.workers - 1) * args.lease_max
+        expected = min(lowest, args.requests_per_client)
+        if max(admitted) > item.amount or min(admitted) < expected:
+            print(f"  outside the bounds: expected {expected}-{item.amount} per client")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Group-commit benchmark: concurrent threads assign random tasks to random
+users (and complete them) for a while, then print writes/s and commits/s.
+
+    CONFIG_MODE=development python benchmarks/write_queue.py --threads 32 --duration 5
+    CONFIG_MODE=development python benchmarks/write_queue.py --threads 32 --duration 5 --queue
+
+The database must already contain users and tasks.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.common.db import db
+from app.common.writer import run_write, write_queue
+from app.controllers.task import insert_user_task, mark_user_task_completed
+from app.models.task import Task
+from app.models.user import User
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure write and commit throughput.")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds")
+    parser.add_argument("--queue", action="store_true", help="Use the write queue")
+    args = parser.parse_args()
+
+    app = create_app(os.getenv("CONFIG_MODE"))
+    write_queue.enabled = args.queue
+    with app.app_context():
+        user_ids = [user_id for user_id, in db.session.query(User.id).all()]
+        task_ids = [task_id for task_id, in db.session.query(Task.id).all()]
+
+    stop = threading.Event()
+    counts = []
+
+    def worker():
+        writes = 0
+        while not stop.is_set():
+            task_id, user_id = random.choice(task_ids), random.choice(user_ids)
+            with app.app_context():
+                run_write(insert_user_task, task_id, user_id)
+                run_write(mark_user_task_completed, task_id, user_id, False)
+            writes += 2
+        counts.append(writes)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    writes = sum(counts)
+    commits = write_queue.commits if args.queue else writes
+    print(f"writes:  {writes / elapsed:.1f}/s")
+    print(f"commits: {commits / elapsed:.1f}/s ({writes / max(commits, 1):.1f} writes per commit)")
+
+if __name__ == "__main__":
+    main()
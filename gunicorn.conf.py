@@ -0,0 +1,91 @@
+"""
+Gunicorn deployment profile: `gunicorn -c gunicorn.conf.py`
+
+GUNICORN_PRESET picks the worker model:
+  sync    => one request per process, 2 * CPU + 1 processes (default)
+  gthread => CPU + 1 processes with GUNICORN_THREADS threads each
+  gevent  => CPU processes with GUNICORN_WORKER_CONNECTIONS greenlets each,
+             for the OpenAI-bound /tasks/generate path (needs gevent installed)
+
+WEB_CONCURRENCY overrides the number of processes.
+"""
+import multiprocessing
+import os
+
+preset = os.getenv("GUNICORN_PRESET", "sync")
+cpu_count = multiprocessing.cpu_count()
+
+if preset == "gevent":
+    # Must happen before the app is preloaded
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+PRESETS = {
+    "sync": {
+        "worker_class": "sync",
+        "workers": 2 * cpu_count + 1,
+    },
+    "gthread": {
+        "worker_class": "gthread",
+        "workers": cpu_count + 1,
+        "threads": int(os.getenv("GUNICORN_THREADS", 4)),
+    },
+    "gevent": {
+        "worker_class": "gevent",
+        "workers": cpu_count,
+        "worker_connections": int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100)),
+    },
+}
+
+if preset not in PRESETS:
+    raise ValueError(f"Unknown GUNICORN_PRESET: {preset}")
+
+wsgi_app = "run:app"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = PRESETS[preset]["worker_class"]
+workers = int(os.getenv("WEB_CONCURRENCY", PRESETS[preset]["workers"]))
+threads = PRESETS[preset].get("threads", 1)
+worker_connections = PRESETS[preset].get("worker_connections", 1000)
+
+# Import the app once in the master, workers share the modules copy-on-write
+preload_app = True
+
+# /tasks/generate waits on OpenAI
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+keepalive = 5
+
+def on_starting(server):
+    """
+    Warn about several workers with the in-process job queue: jobs still run,
+    but a job lives in the worker that queued it, and GET /jobs/<id>
+    answered by any other worker is a 404.
+    """
+    from run import app
+
+    if server.cfg.workers > 1 and app.config["JOB_QUEUE_BACKEND"] == "thread":
+        server.log.warning(
+            "JOB_QUEUE_BACKEND=thread keeps jobs in the memory of each of the %d workers, "
+            "job status is only reliable with JOB_QUEUE_BACKEND=redis (or WEB_CONCURRENCY=1)",
+            server.cfg.workers,
+        )
+
+def post_fork(server, worker):
+    """
+    Drop connections inherited from the master, each worker opens its own pool,
+    and start loading the task catalogue.
+    """
+    from run import app
+    from app.common.db import db
+    from app.common.catalogue import task_catalogue
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    task_catalogue.start()
@@ -1,8 +1,5 @@
 import os
-from app import create_app
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
+from app import create_app  # importing the app loads .env
 
 app = create_app(os.getenv("CONFIG_MODE"))
 
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+# Read when app.config is imported
+os.environ.setdefault("REDIS_RATE_LIMITER_URI", "memory://")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app import create_app
+from app.common.db import db
+from app.config import TestingConfig
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """
+    Build an app on a fresh SQLite database, keyword arguments override its config.
+    """
+    def make(**config):
+        monkeypatch.setattr(TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}")
+        monkeypatch.setattr(TestingConfig, "RATELIMIT_ENABLED", False, raising=False)
+        for name, value in config.items():
+            monkeypatch.setattr(TestingConfig, name, value, raising=False)
+        app = create_app("testing")
+        with app.app_context():
+            db.create_all(bind_key=None)
+        return app
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+def https_client(app):
+    client = app.test_client()
+    # Talisman redirects plain HTTP
+    client.environ_base["HTTP_X_FORWARDED_PROTO"] = "https"
+    return client
+
+@pytest.fixture
+def client(app):
+    return https_client(app)
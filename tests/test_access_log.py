@@ -0,0 +1,54 @@
+import logging
+import time
+
+import pytest
+from flask import Response, jsonify, stream_with_context
+
+from app.common.log import access_logger
+from conftest import https_client
+
+@pytest.fixture
+def records():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    access_logger.addHandler(handler)
+    yield records
+    access_logger.removeHandler(handler)
+
+@pytest.fixture
+def client(make_app):
+    app = make_app(ACCESS_LOG_ENABLED=True, ACCESS_LOG_SAMPLE_RATE=1.0)
+
+    @app.route("/test/stream")
+    def stream():
+        def lines():
+            for line in ("1\n", "2\n"):
+                time.sleep(0.05)
+                yield line
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+    @app.route("/test/json")
+    def json_body():
+        return jsonify({"ok": True})
+
+    return https_client(app)
+
+def test_streamed_requests_are_timed_until_the_stream_ends(client, records):
+    response = client.get("/test/stream")
+    assert records == []
+
+    assert response.get_data(as_text=True) == "1\n2\n"
+    response.close()
+
+    [record] = records
+    assert record.status == 200
+    assert record.duration_ms >= 100
+    assert record.request_id == response.headers["X-Request-ID"]
+
+def test_other_requests_are_logged_when_the_view_returns(client, records):
+    response = client.get("/test/json")
+
+    [record] = records
+    assert record.path == "/test/json"
+    assert record.response_bytes == len(response.get_data())
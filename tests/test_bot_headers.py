@@ -0,0 +1,39 @@
+import pytest
+
+from app.common.db import db
+from app.models.category import Category
+from app.models.task import Task
+from conftest import https_client
+
+@pytest.fixture
+def client(make_app):
+    app = make_app(BOT_API_KEYS=["bot-key"])
+    client = https_client(app)
+    client.post("/categories/", json={"name": "Personal"})
+    client.post("/users/", json={"telegram_id": 1, "first_name": "Ann"})
+    with app.app_context():
+        db.session.add(Task(description="Call a friend", category_id=Category.query.one().id))
+        db.session.commit()
+    return client
+
+def get_task(client, **headers):
+    return client.post("/tasks/get", json={"telegram_id": 1, "category": "Personal"}, headers=headers)
+
+def test_browsers_get_the_talisman_headers(client):
+    response = get_task(client)
+
+    assert response.status_code == 200
+    assert "Content-Security-Policy" in response.headers
+    assert "X-Frame-Options" in response.headers
+    assert "Strict-Transport-Security" in response.headers
+
+def test_bots_skip_the_browser_headers(client):
+    response = get_task(client, **{"X-Bot-Key": "bot-key"})
+
+    assert response.status_code == 200
+    assert "Content-Security-Policy" not in response.headers
+    assert "X-Frame-Options" not in response.headers
+    assert "Strict-Transport-Security" not in response.headers
+
+def test_unknown_bot_keys_get_the_talisman_headers(client):
+    assert "Content-Security-Policy" in get_task(client, **{"X-Bot-Key": "other"}).headers
@@ -0,0 +1,88 @@
+import pytest
+
+from app.common.catalogue import task_catalogue
+from app.common.db import db
+from app.controllers.task import assign_existing_task
+from app.models.category import Category
+from app.models.task import Task
+from app.models.user import User
+from app.models.user_task import UserTask
+from conftest import https_client
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    app = make_app(TASK_CATALOGUE_ENABLED=True, TASK_CATALOGUE_PATH=None)
+    # Loaded by the tests, not by the background thread
+    monkeypatch.setattr(task_catalogue, "start", lambda: None)
+    with app.app_context():
+        db.session.add_all([Category(name="Sport"), Category(name="Home"), User(telegram_id=1, first_name="Ann")])
+        db.session.add(Task(description="Run 5 km", category_id=1))
+        db.session.commit()
+    return app
+
+@pytest.fixture
+def context(app):
+    with app.app_context():
+        task_catalogue.reload()
+        yield
+
+def add_task(description, category_id):
+    task = Task(description=description, category_id=category_id)
+    db.session.add(task)
+    db.session.commit()
+    return task.id
+
+def test_get_and_choose_follow_index_and_remove(context):
+    assert task_catalogue.get(1) == {"id": 1, "description": "Run 5 km", "category": "Sport"}
+    assert task_catalogue.choose(1)["id"] == 1
+
+    task_catalogue.index(2, 2, "Water the plants")
+    assert task_catalogue.get(2) == {"id": 2, "description": "Water the plants", "category": "Home"}
+    assert task_catalogue.choose(2)["id"] == 2
+
+    task_catalogue.remove(1)
+    assert task_catalogue.get(1) is None
+    assert task_catalogue.choose(1) is None
+    assert task_catalogue.stats()["tasks"] == 1
+
+def test_a_moved_task_is_chosen_in_its_new_category(context):
+    task_catalogue.index(1, 2, "Run 5 km")
+
+    assert task_catalogue.choose(1) is None
+    assert task_catalogue.choose(2) == {"id": 1, "description": "Run 5 km", "category": "Home"}
+
+def test_refresh_picks_up_tasks_added_elsewhere(context):
+    task_id = add_task("Cook dinner", 2)
+
+    task_catalogue.refresh()
+
+    assert task_catalogue.get(task_id)["description"] == "Cook dinner"
+
+def test_a_count_mismatch_reloads(context, monkeypatch):
+    # Deleted by another worker, the catalogue never saw it
+    db.session.execute(db.delete(Task).where(Task.id == 1))
+    db.session.commit()
+    reloads = []
+    monkeypatch.setattr(task_catalogue, "reload", lambda: reloads.append(True))
+
+    task_catalogue.refresh()
+
+    assert reloads == [True]
+
+def test_assign_falls_back_to_the_database_for_a_deleted_task(context):
+    task_id = add_task("Swim 1 km", 1)
+    # Deleted by another worker since the last poll
+    db.session.execute(db.delete(Task).where(Task.id == 1))
+    db.session.commit()
+
+    result = assign_existing_task({"telegram_id": 1, "category_name": "Sport"})
+
+    assert result == {"id": task_id, "description": "Swim 1 km", "category": "Sport"}
+    assert task_catalogue.get(1) is None
+    assert [(user_task.user_id, user_task.task_id) for user_task in UserTask.query] == [(1, task_id)]
+
+def test_catalogue_stats_need_the_admin_key(make_app):
+    client = https_client(make_app(ADMIN_API_KEY="admin-key"))
+
+    assert client.get("/health/catalogue").status_code == 403
+    assert client.get("/health/catalogue", headers={"X-Admin-Key": "admin-key"}).status_code == 200
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+from app.common.catalogue import build_snapshot, map_snapshot, task_catalogue, write_snapshot
+from app.common.db import db
+from app.models.category import Category
+from app.models.task import Task
+
+WATERMARK = datetime(2025, 1, 1, 12, 0)
+
+def round_trip(path, rows):
+    write_snapshot(str(path), build_snapshot(rows), version=7, watermark=WATERMARK)
+    return map_snapshot(str(path))
+
+def test_round_trip_keeps_rows_and_multibyte_descriptions(tmp_path):
+    rows = [(1, 10, "Café au lait"), (4, 20, "Écrire une lettre ✉"), (9, 10, "走る"), (12, 30, "")]
+
+    snapshot, header = round_trip(tmp_path / "catalogue", rows)
+
+    assert [snapshot.row(position) for position in range(len(snapshot))] == rows
+    assert snapshot.find(4) == 1 and snapshot.find(5) is None
+    assert {category_id: list(positions) for category_id, positions in snapshot.positions.items()} == {10: [0, 2], 20: [1], 30: [3]}
+    assert header["version"] == 7
+    assert header["watermark"] == WATERMARK.isoformat()
+
+def test_round_trip_of_an_empty_catalogue(tmp_path):
+    snapshot, header = round_trip(tmp_path / "catalogue", [])
+
+    assert len(snapshot) == 0
+    assert snapshot.find(1) is None
+    assert snapshot.positions == {}
+    assert header["tasks"] == 0
+
+@pytest.mark.parametrize("categories, typecode", [(3, "H"), (0x10001, "i")])
+def test_category_codes_widen_past_65535_categories(tmp_path, categories, typecode):
+    rows = [(task_id, task_id, f"Task {task_id}") for task_id in range(1, categories + 1)]
+
+    snapshot, _ = round_trip(tmp_path / "catalogue", rows)
+
+    assert snapshot.codes.format == typecode
+    assert snapshot.row(categories - 1) == rows[-1]
+
+@pytest.fixture
+def shared_app(make_app, tmp_path):
+    app = make_app(TASK_CATALOGUE_ENABLED=True, TASK_CATALOGUE_PATH=str(tmp_path / "catalogue"))
+    with app.app_context():
+        db.session.add(Category(name="Sport"))
+        db.session.add(Task(description="Run 5 km", category_id=1))
+        db.session.commit()
+    return app
+
+def test_rebuild_is_a_no_op_once_another_process_replaced_the_file(shared_app):
+    with shared_app.app_context():
+        assert task_catalogue.rebuild(seen_version=None)
+        old_version = task_catalogue._file_version()
+        # Another worker rebuilds first
+        assert task_catalogue.rebuild(seen_version=old_version)
+        new_version = task_catalogue._file_version()
+
+        assert not task_catalogue.rebuild(seen_version=old_version)
+        assert task_catalogue._file_version() == new_version
+        assert task_catalogue.rebuild(seen_version=old_version, force=True)
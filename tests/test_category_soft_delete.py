@@ -0,0 +1,19 @@
+from sqlalchemy import func
+
+from app.common.db import db
+from app.models.category import Category
+from app.models.task import Task
+
+def test_relationship_loads_hide_deleted_categories(app):
+    with app.app_context():
+        category = Category(name="Sport")
+        db.session.add(category)
+        db.session.commit()
+        db.session.add(Task(description="Run", category_id=category.id))
+        Category.query.update({"deleted_at": func.now()})
+        db.session.commit()
+        db.session.expunge_all()
+
+        assert Task.query.one().category is None
+        db.session.expunge_all()
+        assert Task.query.execution_options(include_deleted=True).one().category.name == "Sport"
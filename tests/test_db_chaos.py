@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.common.db import db
+from app.common.pool import pool_monitor
+from conftest import https_client
+
+@pytest.fixture
+def fail_statements(app):
+    """
+    Make the next `count` statements fail like a dropped connection, before they reach the database.
+    """
+    remaining = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if remaining[0] > 0:
+            remaining[0] -= 1
+            raise OperationalError(statement, parameters, Exception("injected failure"))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    def fail(count):
+        remaining[0] = count
+    yield fail
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def test_failed_statements_release_their_connections(client, fail_statements):
+    client.post("/categories/", json={"name": "Sport"})
+
+    fail_statements(3)
+    for _ in range(3):
+        response = client.get("/categories/")
+        assert response.status_code == 500
+        assert response.get_json()["error"].startswith("Database error:")
+
+    assert pool_monitor.stats()["default"]["checked_out"] == 0
+    response = client.get("/categories/")
+    assert response.status_code == 200
+    assert [category["name"] for category in response.get_json()] == ["Sport"]
+
+def test_a_failed_write_is_rolled_back(client, fail_statements):
+    fail_statements(1)
+    assert client.post("/categories/", json={"name": "Sport"}).status_code == 500
+
+    assert pool_monitor.stats()["default"]["checked_out"] == 0
+    assert client.post("/categories/", json={"name": "Sport"}).status_code == 201
+    assert [category["name"] for category in client.get("/categories/").get_json()] == ["Sport"]
+
+def test_pool_stats_need_the_admin_key(make_app):
+    app = make_app(ADMIN_API_KEY="admin-key", SQLALCHEMY_ENGINE_OPTIONS={"pool_size": 2, "max_overflow": 3})
+    client = https_client(app)
+
+    assert client.get("/health/pool").status_code == 403
+    response = client.get("/health/pool", headers={"X-Admin-Key": "admin-key"})
+    assert response.status_code == 200
+    assert response.get_json()["default"]["capacity"] == 5
@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.common.db import db
+from app.common.openai import openai_client
+from app.models.user_task import UserTask
+from conftest import https_client
+
+TOKENS = ["Write", " a letter", " to your", " future self."]
+
+class StubCompletions:
+    """
+    Streams TOKENS one chunk at a time, then the usage chunk, like OpenAI with include_usage.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **params):
+        self.calls.append(params)
+        for token in TOKENS:
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+        yield SimpleNamespace(usage=SimpleNamespace(total_tokens=42), choices=[])
+
+@pytest.fixture
+def completions(monkeypatch):
+    completions = StubCompletions()
+    monkeypatch.setattr(openai_client, "_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+def setup_user_and_category(client):
+    client.post("/categories/", json={"name": "Personal"})
+    client.post("/users/", json={"telegram_id": 1, "first_name": "Ann"})
+
+def events(response):
+    """
+    (event, data) of every Server-Sent Event of the response.
+    """
+    result = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            result.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return result
+
+def generate(client):
+    return client.post("/tasks/generate", json={"telegram_id": 1, "category": "Personal", "stream": True})
+
+def test_stream_relays_tokens_then_the_stored_task(app, client, completions):
+    setup_user_and_category(client)
+
+    response = generate(client)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    received = events(response)
+    assert received[0] == ("start", {"category": "Personal"})
+    assert received[1:-1] == [("token", {"content": token}) for token in TOKENS]
+    event, task = received[-1]
+    assert event == "task"
+    assert task["description"] == "Write a letter to your future self."
+    assert task["category"] == "Personal"
+    assert completions.calls[0]["stream"] is True
+    with app.app_context():
+        assert db.session.query(UserTask.task_id).all() == [(task["id"],)]
+
+def test_stream_serves_an_existing_task_over_the_budget(make_app, completions):
+    app = make_app(GENERATION_BUDGET_ENABLED=True, GENERATION_MAX_CONCURRENCY=0, GENERATION_BUDGET_WAIT=0)
+    client = https_client(app)
+    setup_user_and_category(client)
+    existing = client.post("/tasks/", json={"description": "Call a friend", "category": "Personal"}).get_json()
+
+    received = events(generate(client))
+
+    assert received == [
+        ("start", {"category": "Personal"}),
+        ("task", {"id": existing["id"], "description": "Call a friend", "category": "Personal"}),
+    ]
+    assert completions.calls == []
+
+def test_stream_sends_an_error_over_the_budget_without_a_task(make_app, completions):
+    app = make_app(GENERATION_BUDGET_ENABLED=True, GENERATION_MAX_CONCURRENCY=0, GENERATION_BUDGET_WAIT=0)
+    client = https_client(app)
+    setup_user_and_category(client)
+
+    received = events(generate(client))
+
+    assert [event for event, _ in received] == ["start", "error"]
+    assert received[-1][1]["error"] == "Generation budget exceeded, try again later."
+    assert completions.calls == []
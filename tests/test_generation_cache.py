@@ -0,0 +1,36 @@
+import sqlite3
+
+import pytest
+
+from app.common.generation_cache import DiskGenerations, GenerationCache
+
+PARAMS = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Sport"}]}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GenerationCache()
+    cache.enabled = True
+    cache.per_key = 1
+    cache.window_seconds = 3600
+    cache.store = DiskGenerations(str(tmp_path / "generations.db"), max_entries=100)
+    return cache
+
+def used_at(cache):
+    with sqlite3.connect(cache.store.path) as connection:
+        return connection.execute("SELECT used_at FROM generations").fetchone()[0]
+
+def test_lookups_write_nothing_until_flushed(cache, monkeypatch):
+    assert cache.lookup(PARAMS) is None
+    cache.add(PARAMS, "Run 5 km")
+    added_at = used_at(cache)
+
+    writes = []
+    monkeypatch.setattr(cache.store, "touch", writes.append)
+    monkeypatch.setattr(cache.store, "count", writes.append)
+    for _ in range(3):
+        assert cache.lookup(PARAMS) == "Run 5 km"
+    assert writes == []
+
+    monkeypatch.undo()
+    assert cache.stats() == {"entries": 1, "hits": 3, "misses": 1}
+    assert used_at(cache) > added_at
@@ -0,0 +1,61 @@
+import pytest
+
+from app.common.db import db
+from app.controllers.task import record_completed_categories
+from app.models.category import Category
+from app.models.task import Task
+from app.models.user import User
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    app = make_app(
+        HTTP_CACHE_ENABLED=True,
+        HTTP_CACHE_REDIS_URI=None,
+        SQLALCHEMY_BINDS={"replica": f"sqlite:///{tmp_path / 'replica.db'}"},
+    )
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica"])
+        db.session.add_all([User(telegram_id=1, first_name="Jane"), Category(name="Sport")])
+        db.session.add(Task(description="Run 5 km", category_id=1))
+        db.session.commit()
+    return app
+
+def test_full_responses_read_the_primary(app, client):
+    # The replica has not caught up with the user yet
+    response = client.get("/users/1")
+
+    assert response.status_code == 200
+    assert response.get_json()["first_name"] == "Jane"
+    assert client.get("/users/1", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+def test_bookkeeping_columns_keep_the_etag(app, client):
+    etag = client.get("/users/1").headers["ETag"]
+
+    with app.app_context():
+        # What completing a task writes
+        record_completed_categories([(1, 1)])
+        db.session.commit()
+        user = db.session.get(User, 1)
+        user.category_weights_version += 1
+        db.session.commit()
+    assert client.get("/users/1").headers["ETag"] == etag
+
+    with app.app_context():
+        db.session.get(User, 1).first_name = "Janet"
+        db.session.commit()
+    assert client.get("/users/1").headers["ETag"] != etag
+
+def test_last_modified_waits_for_its_second_to_end(app, client, monkeypatch):
+    now = [1767225600.5]
+    monkeypatch.setattr("app.common.http_cache.time.time", lambda: now[0])
+    with app.app_context():
+        db.session.get(User, 1).first_name = "Janet"
+        db.session.commit()
+
+    # Another write may still follow within the same second
+    assert "Last-Modified" not in client.get("/users/1").headers
+
+    now[0] += 1
+    response = client.get("/users/1")
+    last_modified = response.headers["Last-Modified"]
+    assert client.get("/users/1", headers={"If-Modified-Since": last_modified}).status_code == 304
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(code):
+    """
+    Names of the modules imported by running `code`, from `python -X importtime`.
+    """
+    env = {**os.environ, "REDIS_RATE_LIMITER_URI": "memory://", "OPENAI_API_KEY": "sk-test", "TEST_DATABASE_URL": "sqlite://"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+
+@pytest.mark.parametrize("code", ["import app", "from app import create_app; create_app('testing')"])
+def test_openai_and_redis_are_not_imported_at_startup(code):
+    modules = imported_modules(code)
+    for package in ("openai", "redis"):
+        assert not [name for name in modules if name == package or name.startswith(f"{package}.")], (
+            f"{package} is imported at startup"
+        )
@@ -0,0 +1,38 @@
+from limits import RateLimitItemPerMinute
+from limits.storage import MemoryStorage
+
+from app.common.limiter import LeasedFixedWindowRateLimiter, limiter
+
+def test_leases_are_bounded_by_max_keys(monkeypatch):
+    monkeypatch.setattr(LeasedFixedWindowRateLimiter, "max_keys", 3)
+    limiter = LeasedFixedWindowRateLimiter(MemoryStorage())
+    item = RateLimitItemPerMinute(1000)
+
+    for client in ("a", "b", "c"):
+        assert limiter.hit(item, client)
+    # "a" is the most recently used, "b" the least
+    assert limiter.hit(item, "a")
+    assert limiter.hit(item, "d")
+
+    assert list(limiter._leases) == [item.key_for(client) for client in ("c", "a", "d")]
+
+def test_an_evicted_lease_never_admits_over_the_limit(monkeypatch):
+    monkeypatch.setattr(LeasedFixedWindowRateLimiter, "max_keys", 1)
+    limiter = LeasedFixedWindowRateLimiter(MemoryStorage())
+    item = RateLimitItemPerMinute(50)
+
+    admitted = 0
+    for _ in range(100):
+        admitted += limiter.hit(item, "a")
+        limiter.hit(item, "b")
+    assert admitted <= 50
+
+def test_lease_settings_belong_to_each_app(make_app):
+    strategies = {}
+    for lease_max in (5, 50):
+        make_app(RATELIMIT_ENABLED=True, RATELIMIT_STRATEGY="leased-fixed-window", RATELIMIT_LEASE_MAX=lease_max)
+        strategies[lease_max] = limiter.limiter
+
+    assert strategies[5].lease_max == 5
+    assert strategies[50].lease_max == 50
+    assert LeasedFixedWindowRateLimiter.lease_max == 10
@@ -0,0 +1,58 @@
+import pytest
+
+from app.common.db import db
+from app.controllers.category import create_category, get_all_categories
+from conftest import https_client
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_BINDS={"replica": f"sqlite:///{tmp_path / 'replica.db'}"})
+    with app.app_context():
+        db.metadata.create_all(db.engines["replica"])
+    return app
+
+def category_names(engine):
+    with engine.connect() as connection:
+        return [name for name, in connection.execute(db.text("SELECT name FROM categories ORDER BY id"))]
+
+def add_category(engine, name):
+    with engine.begin() as connection:
+        connection.execute(db.text("INSERT INTO categories (name) VALUES (:name)"), {"name": name})
+
+def test_read_only_endpoints_read_the_replica(app, client):
+    with app.app_context():
+        add_category(db.engines["replica"], "Replica")
+        add_category(db.engine, "Primary")
+
+    response = client.get("/categories/")
+
+    assert response.status_code == 200
+    assert [category["name"] for category in response.get_json()] == ["Replica"]
+
+def test_writes_go_to_the_primary(app, client):
+    response = client.post("/categories/", json={"name": "Sport"})
+
+    assert response.status_code == 201
+    with app.app_context():
+        assert category_names(db.engine) == ["Sport"]
+        assert category_names(db.engines["replica"]) == []
+
+def test_reads_stick_to_the_primary_after_a_write(app):
+    with app.app_context():
+        add_category(db.engines["replica"], "Replica")
+
+    with app.test_request_context():
+        assert [category["name"] for category in get_all_categories()] == ["Replica"]
+        create_category({"name": "Sport"})
+        # The replica has not caught up, the request still reads its own write
+        assert [category["name"] for category in get_all_categories()] == ["Sport"]
+
+    with app.test_request_context():
+        assert [category["name"] for category in get_all_categories()] == ["Replica"]
+
+def test_reads_use_the_primary_without_a_replica(make_app):
+    app = make_app()
+    client = https_client(app)
+    client.post("/categories/", json={"name": "Sport"})
+
+    assert [category["name"] for category in client.get("/categories/").get_json()] == ["Sport"]
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from app.common.db import db
+from app.controllers.task import assign_task_to_user
+from app.models.category import Category
+from app.models.task import Task
+from app.models.user import User
+from app.models.user_task import UserTask
+from app.models.user_task_archive import UserTaskArchive
+
+def test_an_archived_assignment_is_not_assigned_again(app):
+    with app.app_context():
+        db.session.add_all([Category(name="Sport"), User(telegram_id=1, first_name="Ann")])
+        db.session.commit()
+        db.session.add_all([Task(description="Run 5 km", category_id=1), Task(description="Swim 1 km", category_id=1)])
+        db.session.commit()
+        db.session.add(UserTaskArchive(id=1, completed_at=datetime(2025, 1, 1), user_id=1, task_id=1))
+        db.session.commit()
+
+        assign_task_to_user(1, 1)
+        assign_task_to_user(2, 1)
+        db.session.commit()
+
+        assert [(user_task.user_id, user_task.task_id) for user_task in UserTask.query] == [(1, 2)]